@@ -0,0 +1,84 @@
+# Run from the repository root: python -m benchmarks.bench_update_frame
+import benchmarks.update_frame_reference as reference
+import target_query as tq
+import polars as pl
+import argparse
+import tempfile
+import time
+
+# GLOBALS
+N_OBSERVATIONS = 100_000
+N_PLANETS = 2_000
+N_FAILED = 50
+ROWWISE_OBSERVATIONS = 5_000    # The row-wise version is O(rows x results)
+
+
+def main():
+    arguments = parse_arguments()
+
+    cycle_frame, query_result = synthetic_cycle_file(
+        arguments.observations, arguments.planets, arguments.failed
+    )
+    joined, join_time = timed(tq.update_frame, cycle_frame, query_result)
+    print(f"update_frame (join): {cycle_frame.height} observations, "
+          f"{query_result.height} results in {join_time:.3f} s")
+
+    # Row-wise reference on a subset, extrapolated to the full frame
+    subset = cycle_frame.head(arguments.rowwise)
+    rowwise, rowwise_time = timed(
+        reference.update_frame_rowwise, subset, query_result
+    )
+    scaled_time = rowwise_time * cycle_frame.height / subset.height
+    print(f"update_frame (row-wise): {subset.height} observations in "
+          f"{rowwise_time:.3f} s, ~{scaled_time:.1f} s for all")
+    print(f"Speed-up: ~{scaled_time / join_time:.0f}x")
+
+    # Both versions agree on the subset
+    subset_joined = tq.update_frame(subset, query_result)
+    assert subset_joined.equals(rowwise), "JOIN AND ROW-WISE DIFFER!"
+
+
+def synthetic_cycle_file(
+        n_observations: int, n_planets: int, n_failed: int
+        ) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Synthetic cycle frame, written to and read back from a cycle file
+    like the ones in data/target_query, and its query result.
+    """
+    cycle_frame, query_result = reference.synthetic_cycle(
+        n_observations, n_planets, n_failed
+    )
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        cycle_file = f"{temporary_dir}/jwst_cycle_1.csv"
+        cycle_frame.drop("jwst_cycle").write_csv(cycle_file)
+        cycle_frame = pl.read_csv(cycle_file).with_columns(
+            pl.lit(1).alias("jwst_cycle")
+        )
+
+    return cycle_frame, query_result
+
+
+def timed(function, *args) -> tuple:
+    """Result and wall time of a function call"""
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Sizes of the synthetic cycle file"""
+    parser = argparse.ArgumentParser(
+        description="Benchmark of target_query.update_frame"
+    )
+    parser.add_argument("--observations", type=int, default=N_OBSERVATIONS)
+    parser.add_argument("--planets", type=int, default=N_PLANETS)
+    parser.add_argument("--failed", type=int, default=N_FAILED)
+    parser.add_argument("--rowwise", type=int, default=ROWWISE_OBSERVATIONS)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Row-wise update_frame before the join, shared by tests and benchmarks
+import polars as pl
+import numpy as np
+
+
+def update_frame_rowwise(
+        parent_frame: pl.DataFrame, child_frame: pl.DataFrame
+        ) -> pl.DataFrame:
+    """Row-wise update_frame before the join (reference implementation)"""
+    queried_columns = np.setdiff1d(child_frame.columns, parent_frame.columns)
+
+    final_frame = parent_frame.with_columns([
+        pl.lit(np.nan).alias(column_name)
+        for column_name in queried_columns
+    ])
+
+    temporary_dictionary = [
+        update_rows_rowwise(element, child_frame)
+        for element in final_frame.iter_rows(named=True)
+    ]
+
+    return pl.DataFrame(temporary_dictionary).sort(by="planet_name")
+
+
+def update_rows_rowwise(row_dict: dict, query_result: pl.DataFrame) -> dict:
+    """Row update of the reference implementation"""
+    try:
+        relevant_query = query_result.row(
+            by_predicate=(pl.col("planet_name") == row_dict["planet_name"]),
+            named=True
+        )
+        for key, value in relevant_query.items():
+            row_dict[key] = value
+
+    except pl.exceptions.NoRowsReturnedError:
+        pass
+
+    return row_dict
+
+
+def synthetic_cycle(
+        n_observations: int, n_planets: int, n_failed: int = 0,
+        seed: int = 0
+        ) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Synthetic cycle frame (columns of the JWST cycle files) and query
+    result, where the last 'n_failed' planets are missing from the
+    query result.
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Planet-{idx} b" for idx in range(n_planets)])
+    observed = rng.integers(0, n_planets, n_observations)
+    # Every planet is observed, failed ones first: the row-wise version
+    # infers its schema from the first 100 rows and raises if a "NaN"
+    # placeholder only shows up after them
+    observed[:n_planets] = np.arange(n_planets)[::-1]
+
+    cycle_frame = pl.DataFrame({
+        "planet_name": names[observed],
+        "jwst_instrument": rng.choice(
+            ["NIRSpec / BOTS", "MIRI / LRS", "NIRISS / SOSS"],
+            n_observations
+        ),
+        "num_obs": rng.integers(1, 4, n_observations),
+        "eap_months": rng.choice([0, 12], n_observations),
+        "pid": rng.integers(1000, 4000, n_observations),
+        "type": rng.choice(["Transit", "Eclipse"], n_observations),
+        "jwst_cycle": np.ones(n_observations, dtype=np.int64),
+    })
+
+    queried = n_planets - n_failed
+    query_result = pl.DataFrame({
+        "planet_name": names[:queried],
+        "host_name": [name[:-2] for name in names[:queried]],
+        "radius_rearth": rng.uniform(0.5, 20., queried),
+        "radius_ref": ["Some et al. 2024"] * queried,
+        "system_size": rng.integers(1, 8, queried),
+    })
+
+    return cycle_frame, query_result
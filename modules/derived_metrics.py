@@ -0,0 +1,205 @@
+import modules.kempton_metrics as km
+import logging as log
+import pandas as pd
+import numpy as np
+import weakref
+
+# GLOBALS
+# Memoized results per input frame: id(frame) -> {metric: (key, values)}
+METRIC_MEMO = {}
+
+
+def filled_teq(columns: dict) -> np.ndarray:
+    """EPA equilibrium temperature, NaN-values from Kempton et al. (2018)"""
+    t_eq_kempton = km.fast_teq(
+        columns["st_teff"], columns["st_rad"], columns["pl_orbsmax"]
+    )
+
+    return np.where(np.isnan(columns["pl_eqt"]), t_eq_kempton,
+                    columns["pl_eqt"])
+
+
+def tsm(columns: dict) -> np.ndarray:
+    """Transmission spectroscopy metric"""
+    return km.fast_tsm(
+        columns["pl_rade"], columns["metric:pl_eqt"], columns["pl_masse"],
+        columns["st_rad"], columns["sy_jmag"]
+    )
+
+
+def esm(columns: dict) -> np.ndarray:
+    """Emission spectroscopy metric"""
+    return km.fast_esm(
+        columns["metric:pl_eqt"], columns["st_teff"], columns["pl_rade"],
+        columns["st_rad"], columns["sy_kmag"]
+    )
+
+
+def transit_depth(columns: dict) -> np.ndarray:
+    """Absolute transit depth in percent"""
+    return km.fast_transit_depth(columns["pl_rade"], columns["st_rad"]) * 1e2
+
+
+def primary_signal(columns: dict) -> np.ndarray:
+    """5 scale-height signal of a H2/He-dominated atmosphere in ppm"""
+    return km.fast_atmospheric_signal(
+        2, columns["metric:pl_eqt"], columns["pl_masse"],
+        columns["pl_rade"], columns["st_rad"]
+    )
+
+
+def secondary_signal(columns: dict) -> np.ndarray:
+    """5 scale-height signal of an Earth-like atmosphere in ppm"""
+    return km.fast_atmospheric_signal(
+        25, columns["metric:pl_eqt"], columns["pl_masse"],
+        columns["pl_rade"], columns["st_rad"]
+    )
+
+
+# Registry of derived columns: raw EPA columns and other derived
+# metrics each one depends on. Derived inputs are available to the
+# metric functions as "metric:<name>". Metrics that are finite with
+# only some of their columns list these as "alternatives".
+DERIVED_METRICS = {
+    "pl_eqt": {
+        "columns": ["pl_eqt", "st_teff", "st_rad", "pl_orbsmax"],
+        "metrics": [], "function": filled_teq,
+        "alternatives": [["pl_eqt"], ["st_teff", "st_rad", "pl_orbsmax"]],
+    },
+    "TSM": {
+        "columns": ["pl_rade", "pl_masse", "st_rad", "sy_jmag"],
+        "metrics": ["pl_eqt"], "function": tsm,
+    },
+    "ESM": {
+        "columns": ["st_teff", "pl_rade", "st_rad", "sy_kmag"],
+        "metrics": ["pl_eqt"], "function": esm,
+    },
+    "td_perc": {
+        "columns": ["pl_rade", "st_rad"],
+        "metrics": [], "function": transit_depth,
+    },
+    "sig_prim_ppm": {
+        "columns": ["pl_masse", "pl_rade", "st_rad"],
+        "metrics": ["pl_eqt"], "function": primary_signal,
+    },
+    "sig_seco_ppm": {
+        "columns": ["pl_masse", "pl_rade", "st_rad"],
+        "metrics": ["pl_eqt"], "function": secondary_signal,
+    },
+}
+
+
+def resolve_metrics(metric_names: list) -> list:
+    """
+    All metrics needed for the requested ones, ordered such that every
+    metric comes after the metrics it depends on.
+    """
+    ordered = []
+
+    def visit(name: str, chain: tuple) -> None:
+        assert name in DERIVED_METRICS, \
+            f"METRIC {name} NOT RECOGNIZED!"
+        assert name not in chain, \
+            f"CIRCULAR METRIC DEPENDENCY {' -> '.join(chain + (name,))}!"
+
+        if name in ordered:
+            return None
+
+        for dependency in DERIVED_METRICS[name]["metrics"]:
+            visit(dependency, chain + (name,))
+        ordered.append(name)
+
+        return None
+
+    for metric_name in metric_names:
+        visit(metric_name, ())
+
+    return ordered
+
+
+def derive_metrics(
+        data_frame: pd.DataFrame, metric_names: list
+        ) -> pd.DataFrame:
+    """
+    Return a copy of 'data_frame' with only the requested derived
+    columns added (or replaced, for 'pl_eqt'). Metrics are computed
+    lazily from their dependencies, and memoized per input frame as
+    long as their input columns do not change. The input frame is not
+    modified.
+    """
+    required = resolve_metrics(metric_names)
+    memo = frame_memo(data_frame)
+
+    # Raw input columns are converted (and fingerprinted) once
+    raw_names = {
+        name for metric in required
+        for name in DERIVED_METRICS[metric]["columns"]
+    }
+    columns = epa_columns(data_frame, raw_names)
+    fingerprints = {
+        name: hash(values.tobytes()) for name, values in columns.items()
+    }
+
+    for metric in required:
+        spec = DERIVED_METRICS[metric]
+        memo_key = (
+            tuple(fingerprints[name] for name in spec["columns"]),
+            tuple(memo[name][0] for name in spec["metrics"]),
+        )
+
+        if metric not in memo or memo[metric][0] != memo_key:
+            log.info(f"Computing derived metric {metric}")
+            memo[metric] = (memo_key, spec["function"](columns))
+
+        columns[f"metric:{metric}"] = memo[metric][1]
+
+    return data_frame.assign(**{
+        metric: columns[f"metric:{metric}"] for metric in metric_names
+    })
+
+
+def metric_filters(metric_names: list) -> list:
+    """
+    Filter spec (see query_filters) of the rows for which all requested
+    metrics can be computed, i.e. without missing inputs.
+    """
+    filter_spec = []
+
+    for metric in resolve_metrics(metric_names):
+        spec = DERIVED_METRICS[metric]
+        alternatives = spec.get("alternatives", [spec["columns"]])
+
+        if len(alternatives) == 1:
+            filter_spec += [
+                (name, "not null") for name in alternatives[0]
+                if (name, "not null") not in filter_spec
+            ]
+        else:
+            filter_spec.append([
+                [(name, "not null") for name in names]
+                for names in alternatives
+            ])
+
+    return filter_spec
+
+
+def epa_columns(data_frame: pd.DataFrame, column_names: set) -> dict:
+    """Float64 arrays of the requested raw columns (units checked once)"""
+    missing = column_names.difference(data_frame.columns)
+    assert len(missing) == 0, \
+        f"MISSING INPUT COLUMN(S) {sorted(missing)} FOR DERIVED METRICS!"
+
+    columns = km.epa_arrays(data_frame[sorted(column_names)])
+
+    return {name: columns[name] for name in column_names}
+
+
+def frame_memo(data_frame: pd.DataFrame) -> dict:
+    """Memo of an input frame (dropped once the frame is collected)"""
+    frame_id = id(data_frame)
+
+    if frame_id not in METRIC_MEMO:
+        METRIC_MEMO[frame_id] = {}
+        weakref.finalize(data_frame, METRIC_MEMO.pop, frame_id, None)
+
+    return METRIC_MEMO[frame_id]
@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import logging as log
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Callable, Union
+
+# GLOBALS
+CACHE_DIR = "output/.epa_cache"
+CACHE_INDEX = "index.json"
+CACHE_TTL = 7 * 24 * 3600           # Seconds until an entry is stale
+CACHE_MAX_BYTES = 512 * 1024 ** 2   # Total size before LRU eviction
+
+# Index updates are serialised, since queries may run on several threads
+INDEX_LOCK = threading.RLock()
+
+
+def normalise_adql(adql_query: str) -> str:
+    """
+    Normalise an ADQL string so that trivially different versions of
+    the same query (line breaks, indentation, trailing semicolon) share
+    one cache entry. Quoted literals (e.g. planet names) are untouched.
+    """
+    # Split into quoted literals (odd indices) and query text
+    segments = re.split(r"('(?:[^']|'')*')", adql_query.strip())
+
+    normalised = ""
+    for idx, segment in enumerate(segments):
+        if idx % 2 == 1:
+            normalised += segment
+        else:
+            normalised += re.sub(r"\s+", " ", segment)
+
+    return normalised.strip().rstrip(";").strip()
+
+
+def cache_key(adql_query: str, extra: str = "") -> str:
+    """Hash of the normalised query (plus optional extra payload)."""
+    key_string = f"{normalise_adql(adql_query)}\n{extra}"
+
+    return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+
+def read_index(cache_dir: str = CACHE_DIR) -> dict:
+    """Read the cache index (empty if no cache exists yet)."""
+    index_file = f"{cache_dir}/{CACHE_INDEX}"
+    if not os.path.isfile(index_file):
+        return {}
+
+    try:
+        with open(index_file, "r") as file:
+            return json.load(file)
+
+    except (json.JSONDecodeError, OSError):
+        log.warning(f"Cache index {index_file} unreadable, starting fresh")
+        return {}
+
+
+def write_index(index: dict, cache_dir: str = CACHE_DIR) -> None:
+    """Atomically replace the cache index."""
+    os.makedirs(cache_dir, exist_ok=True)
+    temporary_file = f"{cache_dir}/{CACHE_INDEX}.tmp"
+
+    with open(temporary_file, "w") as file:
+        json.dump(index, file, indent=1)
+    os.replace(temporary_file, f"{cache_dir}/{CACHE_INDEX}")
+
+    return None
+
+
+def load_cached(
+        key: str, ttl: float = CACHE_TTL, cache_dir: str = CACHE_DIR
+        ) -> Union[pa.Table, None]:
+    """
+    Return the cached result table for a key, or None if it does not
+    exist or is older than the TTL.
+    """
+    with INDEX_LOCK:
+        index = read_index(cache_dir)
+        entry = index.get(key)
+        data_file = f"{cache_dir}/{key}.parquet"
+
+        if entry is None or not os.path.isfile(data_file):
+            return None
+
+        if time.time() - entry["created"] > ttl:
+            log.info(f"Cache entry {key[:12]} expired")
+            return None
+
+        result_table = pq.read_table(data_file, memory_map=True)
+
+        # Record the access for LRU eviction
+        entry["accessed"] = time.time()
+        write_index(index, cache_dir)
+
+    return result_table
+
+
+def store_cached(
+        key: str, adql_query: str, result_table: pa.Table,
+        max_bytes: int = CACHE_MAX_BYTES, cache_dir: str = CACHE_DIR
+        ) -> None:
+    """Store a result table in the cache and evict if necessary."""
+    os.makedirs(cache_dir, exist_ok=True)
+    data_file = f"{cache_dir}/{key}.parquet"
+
+    with INDEX_LOCK:
+        pq.write_table(result_table, data_file)
+
+        index = read_index(cache_dir)
+        now = time.time()
+        index[key] = {
+            "query": normalise_adql(adql_query), "created": now,
+            "accessed": now, "size": os.path.getsize(data_file),
+        }
+        write_index(index, cache_dir)
+
+        evict_cache(max_bytes, cache_dir, keep=key)
+
+    return None
+
+
+def evict_cache(
+        max_bytes: int = CACHE_MAX_BYTES, cache_dir: str = CACHE_DIR,
+        keep: str = ""
+        ) -> None:
+    """Remove least recently used entries until the cache fits."""
+    with INDEX_LOCK:
+        index = read_index(cache_dir)
+        total_size = sum(entry["size"] for entry in index.values())
+
+        # Oldest access first
+        by_access = sorted(
+            index.items(), key=lambda item: item[1]["accessed"]
+        )
+
+        for key, entry in by_access:
+            if total_size <= max_bytes:
+                break
+            if key == keep:
+                continue
+
+            data_file = f"{cache_dir}/{key}.parquet"
+            if os.path.isfile(data_file):
+                os.remove(data_file)
+            total_size -= entry["size"]
+            del index[key]
+            log.info(f"Evicted cache entry {key[:12]}")
+
+        write_index(index, cache_dir)
+
+    return None
+
+
+def clear_cache(cache_dir: str = CACHE_DIR) -> None:
+    """Remove all cached result tables."""
+    with INDEX_LOCK:
+        for key in read_index(cache_dir):
+            data_file = f"{cache_dir}/{key}.parquet"
+            if os.path.isfile(data_file):
+                os.remove(data_file)
+
+        write_index({}, cache_dir)
+
+    return None
+
+
+def cached_query(
+        adql_query: str, query_function: Callable[[str], pa.Table],
+        refresh: bool = False, extra: str = "",
+        ttl: float = CACHE_TTL, cache_dir: str = CACHE_DIR
+        ) -> pa.Table:
+    """
+    Run 'query_function(adql_query)' through the on-disk cache. A
+    forced refresh skips the lookup but still updates the cache.
+    """
+    key = cache_key(adql_query, extra)
+
+    if not refresh:
+        cached_table = load_cached(key, ttl, cache_dir)
+        if cached_table is not None:
+            log.info(f"Using cached query result {key[:12]}")
+            return cached_table
+
+    result_table = query_function(adql_query)
+    store_cached(key, adql_query, result_table, cache_dir=cache_dir)
+
+    return result_table
@@ -1,3 +1,4 @@
+import modules.query_filters as qf
 import matplotlib.pyplot as plt
 import pandas as pd
 
@@ -10,8 +11,11 @@ def plrad_steff(target_list: pd.DataFrame, savename: str) -> None:
     target_list = target_list.drop_duplicates(["Target Name"])
 
     # Split targets
-    subnept = target_list.loc[target_list["pl_rade"] <= 4.]
-    supernep = target_list.loc[target_list["pl_rade"] > 4.]
+    sub_neptunes = qf.filter_mask(target_list, qf.SUB_NEPTUNES)
+    subnept = target_list.loc[sub_neptunes]
+    supernep = target_list.loc[
+        ~sub_neptunes & target_list["pl_rade"].notna()
+    ]
 
     """
     # TEST
@@ -1,9 +1,24 @@
 import pyvo
 import pandas as pd
+import polars as pl
+import pyarrow as pa
+from astropy.table import Table
+from functools import partial
+from typing import Union
 import logging as log
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+import modules.epa_snapshot as snapshot
+import modules.epa_cache as cache
 
 # GLOBALS
+TAP_SOURCE = "https://exoplanetarchive.ipac.caltech.edu/TAP"
+QUERY_CHUNK_SIZE = 300      # Maximum number of names per IN-clause
+QUERY_WORKERS = 4           # Maximum number of concurrent TAP requests
+UPLOAD_TABLE = "targets"    # Name of the uploaded target list
+OFFLINE = False             # Query the local snapshot instead of TAP
+QUERY_TABLES = ["pscomppars", "ps"]
 QUERY_PARAMETERS = {
     # Auxiliary information
     "pl_name": "planet_name", "sy_pnum": "system_size",
@@ -17,6 +32,25 @@ QUERY_PARAMETERS = {
     "st_mass": ("star-mass", "msol"), "st_lum": ("star-log10-lbol", "lsol"),
     "st_age": ("star-age", "ga"), "st_vsin": ("star-rotvel", "kms"),
 }
+# Rules to pick one reference solution per planet from the 'ps' table,
+# in order of priority: (sort key, columns, sort descending)
+SOLUTION_RULES = {
+    "has_mass": (
+        pl.col("pl_bmasse").is_not_null(), ["pl_bmasse"], True
+    ),
+    "most_recent": (pl.col("pl_pubdate"), ["pl_pubdate"], True),
+    "radius_error": (
+        pl.col("pl_radeerr1").abs() + pl.col("pl_radeerr2").abs(),
+        ["pl_radeerr1", "pl_radeerr2"], False
+    ),
+    "default": (pl.col("default_flag"), ["default_flag"], True),
+}
+SOLUTION_PRIORITY = ["has_mass", "most_recent", "radius_error", "default"]
+# The 'ps' table has no reference per parameter (*_reflink), only one
+# per solution for the planet, stellar and system parameters
+PS_REFERENCES = {
+    "pl_": "pl_refname", "st_": "st_refname", "sy_": "sy_refname",
+}
 
 
 def assign_query_parameters(
@@ -39,29 +73,143 @@ def assign_query_parameters(
 
 def construct_adql_query(
         planet_names: np.ndarray,
-        query_parameter_list: dict
+        query_parameter_list: dict,
+        table: str = "pscomppars"
         ) -> str:
     """Construct a string to query the exoplanet archive through TAP"""
     # Construct correct query-related strings
-    selection_string = string_from_list(list(query_parameter_list.keys()))
+    selection_string = string_from_list(
+        query_columns(query_parameter_list, table)
+    )
     name_sequence = string_from_list(list(planet_names), "'")
 
     # Base query: Search in the "planetary system composite"
-    # (or pscomppars) table (rather than the ps table)
-    base_str = f"SELECT {selection_string} FROM pscomppars "
+    # (or pscomppars) table, or in all solutions of the ps table
+    base_str = f"SELECT {selection_string} FROM {table} "
     query_name = f"WHERE pl_name IN ({name_sequence})"
 
-    # Log information about the queried table
-    log.info(
-        "All queries are made to the 'pscomppars' table "
-        "(https://exoplanetarchive.ipac.caltech.edu/docs/API_PS_columns.html) "
-        ", which means they might not be entirely self-consistent!")
+    log_query_table(table)
 
     return f"{base_str}{query_name}"
 
 
-def create_query_parameter_catalogue(parameter_list: dict) -> dict:
-    """Create extended parameter catalogue to query the EPA."""
+def construct_upload_query(
+        query_parameter_list: dict, table: str = "pscomppars"
+        ) -> str:
+    """
+    Construct a string to query the exoplanet archive through TAP,
+    joining 'pscomppars' (or 'ps') against an uploaded table of target
+    names. The query is independent of the number of targets.
+    """
+    selection_string = string_from_list(
+        query_columns(query_parameter_list, table), "", "p."
+    )
+
+    base_str = f"SELECT {selection_string} FROM {table} AS p "
+    join_str = (f"JOIN TAP_UPLOAD.{UPLOAD_TABLE} AS t "
+                f"ON p.pl_name = t.target_name")
+
+    log_query_table(table)
+
+    return f"{base_str}{join_str}"
+
+
+def query_columns(query_parameter_list: dict, table: str) -> list:
+    """
+    Archive columns to select: the catalogue, plus the columns of the
+    solution rules for the 'ps' table (which holds its references in
+    the solution reference columns, see ps_column).
+    """
+    assert table in QUERY_TABLES, f"QUERY TABLE {table} NOT RECOGNIZED!"
+    columns = list(query_parameter_list.keys())
+
+    if table == "ps":
+        columns = [ps_column(name) for name in columns]
+        columns += [
+            name for rule in SOLUTION_PRIORITY
+            for name in SOLUTION_RULES[rule][1]
+            if name not in columns
+        ]
+
+    return list(dict.fromkeys(columns))
+
+
+def ps_column(column_name: str) -> str:
+    """Column of the 'ps' table holding a (pscomppars) catalogue column"""
+    if column_name.endswith("_reflink"):
+        return PS_REFERENCES[column_name[:3]]
+
+    return column_name
+
+
+def log_query_table(table: str) -> None:
+    """Log information about the queried table"""
+    if table == "pscomppars":
+        log.info(
+            "All queries are made to the 'pscomppars' table "
+            "(https://exoplanetarchive.ipac.caltech.edu/docs/"
+            "API_PS_columns.html), which means they might not be "
+            "entirely self-consistent!")
+    else:
+        log.info(
+            "All queries are made to the 'ps' table, with one solution "
+            f"per planet selected by {SOLUTION_PRIORITY}")
+
+    return None
+
+
+def select_solutions(
+        arrow_table: pa.Table, query_parameter_list: dict,
+        priority: Union[list, None] = None
+        ) -> pa.Table:
+    """
+    Pick one self-consistent solution (row of the 'ps' table) per
+    planet: rows are sorted by the rules in 'priority' (see
+    SOLUTION_RULES) and the first row of each planet is kept. Columns
+    only needed for the rules are dropped afterwards, and reference
+    columns are taken from the solution references (see PS_REFERENCES).
+    """
+    if priority is None:
+        priority = SOLUTION_PRIORITY
+
+    for rule in priority:
+        assert rule in SOLUTION_RULES, \
+            f"SOLUTION RULE {rule} NOT RECOGNIZED!"
+
+    catalogue_columns = [
+        pl.col(ps_column(name)).alias(name) for name in query_parameter_list
+    ]
+
+    solutions = pl.from_arrow(arrow_table)
+    if solutions.height == 0:
+        return solutions.select(catalogue_columns).to_arrow()
+
+    sort_keys = [
+        SOLUTION_RULES[rule][0].alias(f"rule_{rule}") for rule in priority
+    ]
+
+    solutions = solutions.with_columns(sort_keys).sort(
+        [f"rule_{rule}" for rule in priority],
+        descending=[SOLUTION_RULES[rule][2] for rule in priority],
+        nulls_last=True, maintain_order=True
+    ).unique(subset=["pl_name"], keep="first", maintain_order=True)
+
+    return solutions.select(catalogue_columns).to_arrow()
+
+
+def create_query_parameter_catalogue(
+        parameter_list: dict,
+        columns: Union[list, set, None] = None,
+        errors: bool = False,
+        references: bool = False
+        ) -> dict:
+    """
+    Create extended parameter catalogue to query the EPA. Without
+    'columns', every parameter is expanded into value, uncertainties
+    and reference. Otherwise only parameters whose output column is
+    listed are kept, and their uncertainty and reference columns only
+    if requested through 'errors' / 'references' (or listed).
+    """
     # Define exceptions from the standardised name space
     exceptions = ["pl_name", "sy_pnum", "hostname", "pl_letter"]
 
@@ -71,42 +219,265 @@ def create_query_parameter_catalogue(parameter_list: dict) -> dict:
     # Loop over all parameter values
     for key, value in parameter_list.items():
 
-        # If in exceptions, only return the initial pair
+        # If in exceptions, only return the initial pair (the planet
+        # name is always needed to match the results)
         if key in exceptions:
-            finalised_dictionary = finalised_dictionary | {key: value}
+            if columns is None or value in columns or key == "pl_name":
+                finalised_dictionary = finalised_dictionary | {key: value}
 
         else:
             my_name, phys_unit = value
             temporary_dict = assign_query_parameters(key, my_name, phys_unit)
+            if columns is not None:
+                temporary_dict = prune_parameter_set(
+                    temporary_dict, columns, errors, references
+                )
             finalised_dictionary = finalised_dictionary | temporary_dict
 
     return finalised_dictionary
 
 
-def query_nasa_epa(target_names: np.ndarray) -> pd.DataFrame:
+def prune_parameter_set(
+        parameter_set: dict, columns: Union[list, set],
+        errors: bool, references: bool
+        ) -> dict:
+    """
+    Reduce the expanded set of one parameter (see
+    assign_query_parameters) to the columns a consumer needs.
+    """
+    value_key, error_pos, error_neg, reference = list(parameter_set)
+    requested = parameter_set[value_key] in columns
+
+    keep = {value_key: requested}
+    keep[error_pos] = keep[error_neg] = requested and errors
+    keep[reference] = requested and references
+
+    return {
+        key: name for key, name in parameter_set.items()
+        if keep[key] or name in columns
+    }
+
+
+def run_tap_query(
+        adql_query: str, refresh: bool = False,
+        uploads: Union[dict, None] = None
+        ) -> pd.DataFrame:
+    """
+    Execute an ADQL query against the NASA EPA TAP service, returned
+    as pandas frame (see run_tap_query_arrow).
+    """
+    return run_tap_query_arrow(adql_query, refresh, uploads).to_pandas()
+
+
+def run_tap_query_arrow(
+        adql_query: str, refresh: bool = False,
+        uploads: Union[dict, None] = None
+        ) -> pa.Table:
+    """
+    Execute an ADQL query against the NASA EPA TAP service. Results are
+    served from the local cache when an identical query is available,
+    unless 'refresh' forces a new round trip. Uploaded tables (name:
+    pandas frame) are part of the cache key. With OFFLINE, the query
+    runs against the local snapshot (see epa_snapshot) instead.
+    """
+    if OFFLINE is True:
+        return snapshot.run_local_query(adql_query, uploads)
+
+    upload_key = ""
+    if uploads is not None:
+        upload_key = "".join(
+            f"{name}:{frame.to_csv(index=False)}"
+            for name, frame in sorted(uploads.items())
+        )
+
+    return cache.cached_query(
+        adql_query, partial(search_tap, uploads=uploads),
+        refresh=refresh, extra=upload_key
+    )
+
+
+def search_tap(
+        adql_query: str, uploads: Union[dict, None] = None
+        ) -> pa.Table:
+    """Uncached TAP search through pyVO, returned as Arrow table."""
+    # Set up NASA EPA query with pyVO
+    service = pyvo.dal.TAPService(TAP_SOURCE)
+
+    # TAP uploads are sent as VOTables
+    if uploads is not None:
+        uploads = {
+            name: Table.from_pandas(frame)
+            for name, frame in uploads.items()
+        }
+
+    # Use pyVO to query NASA EPA
+    result_table = service.search(adql_query, uploads=uploads)  # type: ignore
+
+    return astropy_to_arrow(result_table.to_table())
+
+
+def astropy_to_arrow(astropy_table: Table) -> pa.Table:
+    """
+    Convert an astropy table to Arrow column by column. Numerical
+    columns without masked entries are wrapped without copying, masks
+    become Arrow validity bitmaps.
+    """
+    arrow_columns = {}
+    for name in astropy_table.colnames:
+        column = astropy_table[name]
+        data = np.asarray(column)
+        mask = np.ma.getmask(column)
+
+        # Byte strings (from VOTables) are decoded to text
+        if data.dtype.kind == "S":
+            data = np.char.decode(data, "utf-8")
+
+        if mask is np.ma.nomask or not np.any(mask):
+            arrow_columns[name] = pa.array(data)
+        else:
+            arrow_columns[name] = pa.array(data, mask=np.asarray(mask))
+
+    return pa.table(arrow_columns)
+
+
+def query_nasa_epa(
+        target_names: np.ndarray, refresh: bool = False,
+        mode: str = "inline", output: str = "pandas",
+        columns: Union[list, set, None] = None,
+        errors: bool = False, references: bool = False,
+        table: str = "pscomppars"
+        ) -> Union[pd.DataFrame, pl.DataFrame, pa.Table]:
     """
     Query the NASA Exoplanet Archive using TAP through pyVO. The
     values returned here are the ones flagged as "default" in the EPA
     catalogue.
+
+    mode = "inline": one query with all names in the IN-clause
+    mode = "chunked": bounded IN-clauses, run concurrently
+    mode = "upload": names uploaded as table and joined server-side
+
+    output = "arrow", "polars" or "pandas": the result is kept as Arrow
+    table (with renamed columns) and only converted at the very end
+
+    columns: output columns the caller needs (all columns if None),
+    with uncertainty and reference columns opt-in (see
+    create_query_parameter_catalogue)
+
+    table = "pscomppars" or "ps": with "ps", all solutions of the
+    targets are queried and one per planet is kept (see
+    select_solutions), so that its parameters are self-consistent
     """
-    # Set up NASA EPA query with pyVO
-    tap_source = "https://exoplanetarchive.ipac.caltech.edu/TAP"
-    service = pyvo.dal.TAPService(tap_source)
+    # Sanity check: offline, all solutions of 'ps' are needed
+    if OFFLINE is True and table == "ps":
+        snapshot.check_snapshot(table)
 
     # Generate comprehensive query parameters
-    full_query_list = create_query_parameter_catalogue(QUERY_PARAMETERS)
+    full_query_list = create_query_parameter_catalogue(
+        QUERY_PARAMETERS, columns, errors, references
+    )
 
-    # Construct ADQL query
+    # Query NASA EPA (or re-use a cached result)
     log.info(f"Querying NASA EPA for {target_names.shape[0]} targets:\n"
              f"{target_names}")
-    adql_query = construct_adql_query(target_names, full_query_list)
 
-    # Use pyVO to query NASA EPA
-    result_table = service.search(adql_query)  # type: ignore
+    if mode == "inline":
+        adql_query = construct_adql_query(
+            target_names, full_query_list, table
+        )
+        arrow_table = run_tap_query_arrow(adql_query, refresh=refresh)
+
+    elif mode == "chunked":
+        arrow_table = query_in_chunks(
+            target_names, full_query_list, refresh=refresh, table=table
+        )
+
+    elif mode == "upload":
+        adql_query = construct_upload_query(full_query_list, table)
+        name_table = pd.DataFrame({"target_name": target_names})
+        arrow_table = run_tap_query_arrow(
+            adql_query, refresh=refresh, uploads={UPLOAD_TABLE: name_table}
+        )
+
+    else:
+        raise ValueError(f"QUERY MODE {mode} NOT RECOGNIZED!")
+
+    if table == "ps":
+        arrow_table = select_solutions(arrow_table, full_query_list)
 
     # Sanity check: No targets are lost in the query
     # (ONLY A WARNING FOR NOW)
-    lost_targets = np.setxor1d(target_names, result_table["pl_name"])
+    check_lost_targets(
+        target_names, arrow_table["pl_name"].to_numpy(zero_copy_only=False)
+    )
+
+    # Rename to internal naming scheme (only changes the schema)
+    arrow_table = arrow_table.rename_columns([
+        full_query_list.get(name, name) for name in arrow_table.column_names
+    ])
+
+    if output == "arrow":
+        return arrow_table
+
+    elif output == "polars":
+        return pl.from_arrow(arrow_table)
+
+    elif output == "pandas":
+        return arrow_table.to_pandas()
+
+    else:
+        raise ValueError(f"OUTPUT FORMAT {output} NOT RECOGNIZED!")
+
+
+def query_in_chunks(
+        target_names: np.ndarray,
+        query_parameter_list: dict,
+        refresh: bool = False,
+        table: str = "pscomppars",
+        chunk_size: int = QUERY_CHUNK_SIZE,
+        max_workers: int = QUERY_WORKERS
+        ) -> pa.Table:
+    """
+    Split a (long) list of target names into bounded chunks, query them
+    on a thread pool and merge the partial result tables. Without any
+    target names, an empty table with the selected columns is returned.
+    """
+    if target_names.shape[0] == 0:
+        log.warning("No target names to query")
+        return empty_result(query_parameter_list, table)
+
+    chunks = [
+        target_names[idx:idx + chunk_size]
+        for idx in range(0, target_names.shape[0], chunk_size)
+    ]
+    log.info(f"Splitting query into {len(chunks)} chunk(s) of at most "
+             f"{chunk_size} targets")
+
+    def query_chunk(chunk: np.ndarray) -> pa.Table:
+        adql_query = construct_adql_query(
+            chunk, query_parameter_list, table
+        )
+        return run_tap_query_arrow(adql_query, refresh=refresh)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partial_tables = list(executor.map(query_chunk, chunks))
+
+    # Concatenating Arrow tables does not copy the column data
+    return pa.concat_tables(partial_tables)
+
+
+def empty_result(query_parameter_list: dict, table: str) -> pa.Table:
+    """Query result without rows (columns of unknown type are null)"""
+    return pa.table({
+        name: pa.array([], type=pa.null())
+        for name in query_columns(query_parameter_list, table)
+    })
+
+
+def check_lost_targets(
+        target_names: np.ndarray, queried_names: np.ndarray
+        ) -> np.ndarray:
+    """Log all targets that are missing from the query result."""
+    lost_targets = np.setxor1d(target_names, queried_names)
 
     if lost_targets.size == 0:
         log.info("All targets queried successfully!")
@@ -116,21 +487,20 @@ def query_nasa_epa(target_names: np.ndarray) -> pd.DataFrame:
             f"not be queried in the EPA:\n{lost_targets}"
         )
 
-    # Make into pandas frame
-    pandas_frame = result_table.to_table().to_pandas()
-    pandas_frame.rename(columns=full_query_list, inplace=True)
-
-    return pandas_frame
+    return lost_targets
 
 
-def string_from_list(names: list, qualifier: str = "") -> str:
+def string_from_list(
+        names: list, qualifier: str = "", prefix: str = ""
+        ) -> str:
     """
     Construct a string of comma-separated values from a list.
-    An optional qualifier can be wrapped around list-entries.
+    An optional qualifier can be wrapped around list-entries, and an
+    optional prefix (e.g. a table alias) put in front of them.
     """
     name_sequence = ""
     for name in names:
-        name_sequence += f"{qualifier}{name}{qualifier},"
+        name_sequence += f"{prefix}{qualifier}{name}{qualifier},"
 
     # THIS removes the trailing comma
     name_sequence = name_sequence[:-1]
@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import time
+import logging as log
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Callable, Union
+
+# The embedded SQL engine is only needed for offline queries
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# GLOBALS
+SNAPSHOT_DIR = "output/.epa_snapshot"
+SNAPSHOT_INFO = "snapshot.json"
+# Archive tables mirrored locally, with the query that fetches them
+# (all solutions of 'ps', to pick reference solutions offline)
+SNAPSHOT_TABLES = {
+    "pscomppars": "SELECT * FROM pscomppars",
+    "ps": "SELECT * FROM ps",
+}
+
+
+def snapshot_file(table_name: str, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+    """Location of the local copy of an archive table"""
+    return f"{snapshot_dir}/{table_name}.parquet"
+
+
+def refresh_snapshot(
+        query_function: Callable[[str], pa.Table],
+        table_names: Union[list, None] = None,
+        snapshot_dir: str = SNAPSHOT_DIR
+        ) -> dict:
+    """
+    Download archive tables (all of SNAPSHOT_TABLES by default) through
+    'query_function' (e.g. epa_query.search_tap) and store them as
+    parquet files. Returns the updated snapshot information.
+    """
+    if table_names is None:
+        table_names = list(SNAPSHOT_TABLES)
+
+    # Sanity check: all names are known before anything is downloaded
+    for table_name in table_names:
+        assert table_name in SNAPSHOT_TABLES, \
+            f"SNAPSHOT TABLE {table_name} NOT RECOGNIZED!"
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshot_info = read_snapshot_info(snapshot_dir)
+
+    for table_name in table_names:
+        log.info(f"Downloading snapshot of {table_name}")
+        result_table = query_function(SNAPSHOT_TABLES[table_name])
+
+        # Replace atomically, so that readers never see a partial file
+        data_file = snapshot_file(table_name, snapshot_dir)
+        pq.write_table(result_table, f"{data_file}.tmp")
+        os.replace(f"{data_file}.tmp", data_file)
+
+        snapshot_info[table_name] = {
+            "query": SNAPSHOT_TABLES[table_name], "created": time.time(),
+            "rows": result_table.num_rows,
+            "size": os.path.getsize(data_file),
+        }
+
+    with open(f"{snapshot_dir}/{SNAPSHOT_INFO}", "w") as file:
+        json.dump(snapshot_info, file, indent=1)
+
+    return snapshot_info
+
+
+def read_snapshot_info(snapshot_dir: str = SNAPSHOT_DIR) -> dict:
+    """Creation time, size and source query of each snapshot table"""
+    info_file = f"{snapshot_dir}/{SNAPSHOT_INFO}"
+    if not os.path.isfile(info_file):
+        return {}
+
+    with open(info_file, "r") as file:
+        return json.load(file)
+
+
+def check_snapshot(table_name: str, snapshot_dir: str = SNAPSHOT_DIR) -> None:
+    """
+    Sanity check: the snapshot of a table was created with its current
+    query (earlier snapshots of 'ps' only hold the default solutions).
+    """
+    entry = read_snapshot_info(snapshot_dir).get(table_name, {})
+
+    if entry.get("query") != SNAPSHOT_TABLES[table_name]:
+        raise ValueError(
+            f"SNAPSHOT OF {table_name} IS OUTDATED OR MISSING, RUN "
+            f"target_snapshot.py refresh {table_name} FIRST!"
+        )
+
+    return None
+
+
+def adql_to_sql(adql_query: str, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+    """
+    Translate the ADQL used in this repository to DuckDB SQL: archive
+    tables become their parquet snapshots, uploaded tables
+    (TAP_UPLOAD.<name>) are registered views, and "SELECT TOP n" turns
+    into a trailing LIMIT.
+    """
+    sql_query = adql_query.strip().rstrip(";")
+
+    def local_table(match: re.Match) -> str:
+        table_name = match.group(2).lower()
+        data_file = snapshot_file(table_name, snapshot_dir)
+
+        if not os.path.isfile(data_file):
+            raise FileNotFoundError(
+                f"NO SNAPSHOT OF {table_name} IN {snapshot_dir}, "
+                f"RUN target_snapshot.py FIRST!"
+            )
+
+        return f"{match.group(1)}read_parquet('{data_file}')"
+
+    tables = "|".join(SNAPSHOT_TABLES)
+    sql_query = re.sub(
+        rf"(\b(?:FROM|JOIN)\s+)({tables})\b", local_table, sql_query,
+        flags=re.IGNORECASE
+    )
+    sql_query = re.sub(
+        r"\bTAP_UPLOAD\.(\w+)", r"\1", sql_query, flags=re.IGNORECASE
+    )
+
+    top = re.match(r"\s*SELECT\s+TOP\s+(\d+)\s+", sql_query,
+                   flags=re.IGNORECASE)
+    if top is not None:
+        sql_query = f"SELECT {sql_query[top.end():]} LIMIT {top.group(1)}"
+
+    return sql_query
+
+
+def run_local_query(
+        adql_query: str, uploads: Union[dict, None] = None,
+        snapshot_dir: str = SNAPSHOT_DIR
+        ) -> pa.Table:
+    """
+    Execute an ADQL query against the local snapshot (see
+    refresh_snapshot). Uploaded tables (name: pandas frame) are
+    registered under their upload name.
+    """
+    assert duckdb is not None, "DUCKDB IS REQUIRED FOR OFFLINE QUERIES!"
+
+    sql_query = adql_to_sql(adql_query, snapshot_dir)
+
+    # One in-memory connection per query (queries may run on threads)
+    connection = duckdb.connect()
+    try:
+        for name, frame in (uploads or {}).items():
+            connection.register(name, frame)
+
+        result = connection.execute(sql_query)
+
+        # Renamed in recent DuckDB versions
+        if hasattr(result, "to_arrow_table"):
+            return result.to_arrow_table()
+        return result.fetch_arrow_table()
+
+    finally:
+        connection.close()
@@ -0,0 +1,109 @@
+import modules.metric_uncertainty as mu
+import modules.util as u
+from typing import Union
+import numpy as np
+
+# GLOBALS
+# Zone labels by the number of HZ boundaries (oi, ci, co, oo) inside
+# the planet orbit; invalid inputs are labelled ""
+HZ_ZONES = ["inner", "optimistic", "conservative", "optimistic", "outer"]
+HZ_TEMPERATURE_RANGE = (2600., 7200.)   # Validity of Kopparapu et al. (2014)
+HZ_MC_SAMPLES = 1000
+
+
+def hz_zone_index(
+        sma: np.ndarray, effect_temp: np.ndarray, lum: np.ndarray
+        ) -> np.ndarray:
+    """
+    Number of HZ boundaries inside the orbit of each planet (0: closer
+    than the optimistic inner edge, 4: beyond the optimistic outer
+    edge), -1 for missing values or temperatures outside the validity
+    range. Inputs may carry additional (sample) dimensions.
+    """
+    sma = np.asarray(sma, dtype=np.float64)
+    effect_temp = np.asarray(effect_temp, dtype=np.float64)
+    boundaries = u.habitable_zone_boundaries(effect_temp, lum)
+
+    # The conservative zone includes both of its edges
+    zone = (
+        (sma >= boundaries[0]).astype(np.int8)
+        + (sma >= boundaries[1]) + (sma > boundaries[2])
+        + (sma > boundaries[3])
+    )
+
+    valid = (
+        np.isfinite(sma) & np.isfinite(boundaries).all(axis=0)
+        & (effect_temp >= HZ_TEMPERATURE_RANGE[0])
+        & (effect_temp <= HZ_TEMPERATURE_RANGE[1])
+    )
+
+    return np.where(valid, zone, -1)
+
+
+def classify_habitable_zone(
+        sma: np.ndarray, effect_temp: np.ndarray, log_lum: np.ndarray
+        ) -> np.ndarray:
+    """
+    HZ zone label of each planet from its semi-major axis (in au), the
+    stellar effective temperature (in K) and the stellar luminosity as
+    given in the EPA (log10 of solar units).
+    """
+    lum = 10 ** np.asarray(log_lum, dtype=np.float64)
+    lookup = np.array(HZ_ZONES + [""])
+
+    # Index -1 picks the trailing empty label
+    return lookup[hz_zone_index(sma, effect_temp, lum)]
+
+
+def habitable_zone_probabilities(
+        sma: np.ndarray,
+        effect_temp: np.ndarray, temp_errpos: np.ndarray,
+        temp_errneg: np.ndarray,
+        log_lum: np.ndarray, lum_errpos: np.ndarray, lum_errneg: np.ndarray,
+        n_samples: int = HZ_MC_SAMPLES, seed: Union[int, None] = None
+        ) -> dict:
+    """
+    Monte Carlo probabilities of each planet to orbit in the
+    conservative and in the (wider) optimistic HZ, drawing stellar
+    temperature and log-luminosity from their asymmetric uncertainties.
+    Planets without valid samples receive NaN.
+    """
+    rng = np.random.default_rng(seed)
+    sma = np.asarray(sma, dtype=np.float64)
+    n_planets = sma.shape[0]
+
+    probabilities = {
+        "conservative": np.full(n_planets, np.nan),
+        "optimistic": np.full(n_planets, np.nan),
+    }
+
+    # Four boundary arrays per sample set
+    step = mu.chunk_size(n_samples, np.float64) // 2
+    step = max(step, 1)
+
+    for start in range(0, n_planets, step):
+        chunk = slice(start, start + step)
+
+        temp_samples = mu.split_normal_samples(
+            effect_temp[chunk], temp_errpos[chunk], temp_errneg[chunk],
+            n_samples, rng
+        )
+        lum_samples = 10 ** mu.split_normal_samples(
+            log_lum[chunk], lum_errpos[chunk], lum_errneg[chunk],
+            n_samples, rng
+        )
+        zone = hz_zone_index(sma[chunk, None], temp_samples, lum_samples)
+
+        valid = np.count_nonzero(zone >= 0, axis=1)
+        conservative = np.count_nonzero(zone == 2, axis=1)
+        optimistic = np.count_nonzero((zone >= 1) & (zone <= 3), axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            probabilities["conservative"][chunk] = np.where(
+                valid > 0, conservative / valid, np.nan
+            )
+            probabilities["optimistic"][chunk] = np.where(
+                valid > 0, optimistic / valid, np.nan
+            )
+
+    return probabilities
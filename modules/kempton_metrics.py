@@ -1,12 +1,44 @@
 import astropy.constants as c
 import astropy.units as u
 from typing import Union
+import logging as log
 import pandas as pd
 import numpy as np
 
+# GLOBALS
+# SI values of the constants, evaluated once for the fast kernels
+R_EARTH = c.R_earth.si.value
+R_SUN = c.R_sun.si.value
+M_EARTH = c.M_earth.si.value
+AU = c.au.si.value
+G_GRAV = c.G.si.value
+H_PLANCK = c.h.si.value
+C_LIGHT = c.c.si.value
+K_BOLTZMANN = c.k_B.si.value
+M_ATOMIC = c.u.si.value
+
+# Units of the EPA columns used by the fast kernels
+EPA_UNITS = {
+    "pl_rade": u.R_earth, "pl_masse": u.M_earth, "pl_orbsmax": u.au,
+    "pl_eqt": u.K, "st_teff": u.K, "st_rad": u.R_sun,
+    "sy_jmag": u.dimensionless_unscaled, "sy_kmag": u.dimensionless_unscaled,
+}
+ESM_WAVELENGTH = 7.5e-6     # Reference wavelength of the ESM in m
+
+# Table 1 of Kempton et al. (2018): upper radius edges (in R_E),
+# TSM scale factors and class names of the radius bins
+KEMPTON_RADIUS_EDGES = np.array([1.5, 2.75, 4.0, 10.0])
+KEMPTON_SCALE_FACTORS = np.array([0.190, 1.26, 1.28, 1.15])
+KEMPTON_RADIUS_CLASSES = [
+    "terrestrial", "small sub-Neptune", "large sub-Neptune", "sub-Jovian"
+]
+
 
 def kempton_metrics(data_frame: pd.DataFrame) -> None:
-    """DOC!"""
+    """
+    Fill missing equilibrium temperatures and add TSM and ESM columns
+    (see derived_metrics for the fast, lazy counterpart).
+    """
     # Fill NaN-values with T_eq calculations from Kempton et al. (2018)
     t_eq_kempton = kempton_teq(data_frame)
     data_frame["pl_eqt"].fillna(t_eq_kempton, inplace=True)
@@ -28,12 +60,12 @@ def kempton_esm(data_frame: pd.DataFrame) -> pd.Series:
 
     # Second part: Ratio of Planckians at 7.5 microns
     set_wavelength = 7.5 * u.micron
-    dayside_temp = data_frame["pl_eqt"] * 1.1 * u.K
-    stellar_temp = data_frame["st_teff"] * u.K
+    dayside_temp = u.Quantity(data_frame["pl_eqt"] * 1.1, u.K)
+    stellar_temp = u.Quantity(data_frame["st_teff"], u.K)
 
     planck_1 = planck_function_lambda(dayside_temp, set_wavelength)
     planck_2 = planck_function_lambda(stellar_temp, set_wavelength)
-    planck_ratio = planck_1 / planck_2
+    planck_ratio = (planck_1 / planck_2).to_value(u.dimensionless_unscaled)
 
     # Third part: Ratio of areas
     rel_area = (data_frame["pl_rade"] * c.R_earth
@@ -59,9 +91,7 @@ def kempton_tsm(data: pd.DataFrame) -> pd.Series:
     factor = 10 ** (- data["sy_jmag"] / 5)
 
     # Scale factor assignment
-    scale_factor = np.array(
-        [kempton_scale_factor(radius) for radius in data["pl_rade"]]
-    )
+    scale_factor = kempton_scale_factors(data["pl_rade"])
 
     # Put everything together to calculate TSM
     tsm = scale_factor * enum / denom * factor
@@ -91,24 +121,56 @@ def transit_estimations(result_table: pd.DataFrame) -> None:
 
 def kempton_scale_factor(pl_rad: float) -> float:
     """Assign a scale-factor to each planet following Table 1"""
-    scale_factors = [0.190, 1.26, 1.28, 1.15]
+    return float(kempton_scale_factors(np.array([pl_rad]))[0])
+
+
+def kempton_radius_bin(pl_rade: Union[np.ndarray, pd.Series]) -> np.ndarray:
+    """
+    Index of the Table 1 radius bin of each planet. Radii above the
+    last bin edge get index len(KEMPTON_RADIUS_EDGES), NaN and
+    non-positive radii get -1.
+    """
+    radius = np.asarray(pl_rade, dtype=np.float64)
+
+    # Bins include their upper edge (e.g. 1.5 R_E is still terrestrial)
+    bins = np.searchsorted(KEMPTON_RADIUS_EDGES, radius, side="left")
+    bins[~(radius > 0)] = -1
+
+    return bins
+
+
+def kempton_scale_factors(
+        pl_rade: Union[np.ndarray, pd.Series],
+        above_range: float = KEMPTON_SCALE_FACTORS[-1]
+        ) -> np.ndarray:
+    """
+    Assign the Table 1 scale-factors to all planets at once. Table 1
+    ends at 10 R_E, larger planets receive 'above_range' (by default
+    the factor of the last bin, use NaN to exclude them). Invalid
+    radii receive NaN.
+    """
+    bins = kempton_radius_bin(pl_rade)
+
+    above = np.count_nonzero(bins == KEMPTON_RADIUS_EDGES.size)
+    if above > 0:
+        log.info(f"{above} planet(s) above {KEMPTON_RADIUS_EDGES[-1]} R_E "
+                 f"receive a scale factor of {above_range}")
 
-    if pl_rad <= 1.5:
-        return scale_factors[0]
+    lookup = np.append(KEMPTON_SCALE_FACTORS, [above_range, np.nan])
 
-    elif pl_rad <= 2.75:
-        return scale_factors[1]
+    # Keep single precision inputs in single precision
+    if np.asarray(pl_rade).dtype == np.float32:
+        lookup = lookup.astype(np.float32)
 
-    elif pl_rad <= 4.0:
-        return scale_factors[2]
+    # Index -1 picks the trailing NaN of the lookup table
+    return lookup[bins]
 
-    elif pl_rad <= 10.0:
-        return scale_factors[3]
 
-    else:
-        return scale_factors[3]
-        # This should not be able to trigger when only querying sub-Neptunes
-    #    print("WHAT?")
+def kempton_radius_class(pl_rade: Union[np.ndarray, pd.Series]) -> np.ndarray:
+    """Table 1 class label of each planet (empty for invalid radii)"""
+    lookup = np.array(KEMPTON_RADIUS_CLASSES + ["above range", ""])
+
+    return lookup[kempton_radius_bin(pl_rade)]
 
 
 def kempton_teq(data: pd.DataFrame) -> pd.Series:
@@ -131,7 +193,7 @@ def planck_function_lambda(
     temperature
     """
     exp_factor = c.h * c.c / (wavelength * c.k_B * temperature)
-    exp_term = np.exp(exp_factor.to_numpy())
+    exp_term = np.exp(exp_factor.to_value(u.dimensionless_unscaled))
     factor_left = 2 * np.pi * c.h * c.c ** 2
 
     spectral_radiance = factor_left / wavelength ** 5 * 1 / (exp_term - 1)
@@ -184,3 +246,105 @@ def calc_grav_g(planet_mass: pd.Series, planet_radius: pd.Series) -> pd.Series:
 
     grav_g = enum / denom
     return grav_g
+
+
+# FAST KERNELS: plain float64 arrays in the EPA units listed in
+# EPA_UNITS, with constants in SI units (see GLOBALS)
+def epa_arrays(data_frame: pd.DataFrame) -> dict:
+    """
+    Convert the EPA columns used by the fast kernels to float64 arrays.
+    This is the only place units are checked: quantity columns are
+    converted to the EPA units, plain numbers are taken as such.
+    """
+    columns = {}
+    for column_name, unit in EPA_UNITS.items():
+        if column_name not in data_frame.columns:
+            continue
+
+        values = data_frame[column_name].to_numpy()
+        if values.dtype == object and isinstance(values[0], u.Quantity):
+            values = u.Quantity(list(values)).to_value(unit)
+
+        columns[column_name] = np.asarray(values, dtype=np.float64)
+
+    return columns
+
+
+def fast_teq(
+        st_teff: np.ndarray, st_rad: np.ndarray, pl_orbsmax: np.ndarray
+        ) -> np.ndarray:
+    """Unit-free version of kempton_teq (zero albedo, full recirculation)"""
+    return st_teff * np.sqrt(
+        (st_rad * R_SUN) / (pl_orbsmax * AU)
+    ) * (1/4) ** (1/4)
+
+
+def fast_planck(
+        temperature: np.ndarray, wavelength: Union[np.ndarray, float]
+        ) -> np.ndarray:
+    """Unit-free planck_function_lambda (temperature in K, wavelength in m)"""
+    exp_factor = H_PLANCK * C_LIGHT / (wavelength * K_BOLTZMANN * temperature)
+    factor_left = 2 * np.pi * H_PLANCK * C_LIGHT ** 2
+
+    return factor_left / wavelength ** 5 / np.expm1(exp_factor)
+
+
+def fast_esm(
+        pl_eqt: np.ndarray, st_teff: np.ndarray, pl_rade: np.ndarray,
+        st_rad: np.ndarray, sy_kmag: np.ndarray,
+        wavelength: float = ESM_WAVELENGTH
+        ) -> np.ndarray:
+    """Unit-free version of kempton_esm"""
+    planck_ratio = (fast_planck(pl_eqt * 1.1, wavelength)
+                    / fast_planck(st_teff, wavelength))
+    rel_area = fast_transit_depth(pl_rade, st_rad)
+    brightness = 10 ** (- sy_kmag / 5)
+
+    return np.round(4.29e6 * planck_ratio * rel_area * brightness)
+
+
+def fast_tsm(
+        pl_rade: np.ndarray, pl_eqt: np.ndarray, pl_masse: np.ndarray,
+        st_rad: np.ndarray, sy_jmag: np.ndarray
+        ) -> np.ndarray:
+    """Unit-free version of kempton_tsm"""
+    enum = pl_rade ** 3 * pl_eqt
+    denom = pl_masse * st_rad ** 2
+    factor = 10 ** (- sy_jmag / 5)
+
+    scale_factor = kempton_scale_factors(pl_rade)
+
+    return np.round(scale_factor * enum / denom * factor)
+
+
+def fast_transit_depth(pl_rade: np.ndarray, st_rad: np.ndarray) -> np.ndarray:
+    """Squared planet-to-star radius ratio"""
+    return (pl_rade * R_EARTH / (st_rad * R_SUN)) ** 2
+
+
+def fast_grav_g(pl_masse: np.ndarray, pl_rade: np.ndarray) -> np.ndarray:
+    """Unit-free calc_grav_g (result in m / s^2)"""
+    return G_GRAV * pl_masse * M_EARTH / (pl_rade * R_EARTH) ** 2
+
+
+def fast_scale_height(
+        mmw: float, pl_eqt: np.ndarray,
+        pl_masse: np.ndarray, pl_rade: np.ndarray
+        ) -> np.ndarray:
+    """Unit-free calc_scale_height (result in m)"""
+    grav_g = fast_grav_g(pl_masse, pl_rade)
+
+    return K_BOLTZMANN * pl_eqt / (grav_g * mmw * M_ATOMIC)
+
+
+def fast_atmospheric_signal(
+        mmw: float, pl_eqt: np.ndarray, pl_masse: np.ndarray,
+        pl_rade: np.ndarray, st_rad: np.ndarray
+        ) -> np.ndarray:
+    """Unit-free atmospheric_signal (result in ppm)"""
+    scale_h = fast_scale_height(mmw, pl_eqt, pl_masse, pl_rade)
+
+    enum = 2 * pl_rade * R_EARTH * scale_h
+    denom = (st_rad * R_SUN) ** 2
+
+    return np.round(5 * enum / denom * 1e6)
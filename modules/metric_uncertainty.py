@@ -0,0 +1,117 @@
+import modules.kempton_metrics as km
+from typing import Union
+import logging as log
+import pandas as pd
+import numpy as np
+import warnings
+
+# GLOBALS
+MC_PERCENTILES = (16, 50, 84)
+MC_MEMORY_LIMIT = 512 * 1024 ** 2   # Bytes for the sample arrays per chunk
+MC_BUFFERS = 8                      # Sample-sized arrays alive at once
+
+
+def split_normal_samples(
+        value: np.ndarray, err_pos: np.ndarray, err_neg: np.ndarray,
+        n_samples: int, rng: np.random.Generator,
+        dtype: type = np.float64
+        ) -> np.ndarray:
+    """
+    Draw samples from an asymmetric (split) normal distribution for
+    each entry, shape (entries, samples). Upper and lower half use the
+    positive and (absolute) negative uncertainty, missing uncertainties
+    are treated as zero.
+    """
+    value = np.asarray(value, dtype=dtype)[:, None]
+    err_pos = np.nan_to_num(np.asarray(err_pos, dtype=dtype))[:, None]
+    err_neg = np.abs(
+        np.nan_to_num(np.asarray(err_neg, dtype=dtype))
+    )[:, None]
+
+    deviation = rng.standard_normal((value.shape[0], n_samples), dtype=dtype)
+    deviation *= np.where(deviation >= 0, err_pos, err_neg)
+
+    return value + deviation
+
+
+def chunk_size(
+        n_samples: int, dtype: type, memory_limit: int = MC_MEMORY_LIMIT
+        ) -> int:
+    """Number of planets per chunk so that samples fit into memory"""
+    bytes_per_planet = n_samples * np.dtype(dtype).itemsize * MC_BUFFERS
+
+    return max(1, int(memory_limit // bytes_per_planet))
+
+
+def monte_carlo_metrics(
+        data_frame: pd.DataFrame, n_samples: int,
+        single_precision: bool = False,
+        memory_limit: int = MC_MEMORY_LIMIT,
+        seed: Union[int, None] = None
+        ) -> pd.DataFrame:
+    """
+    Percentiles of the TSM and ESM distributions from asymmetric
+    planet mass and radius uncertainties. All samples of a chunk of
+    planets are evaluated as one (planets x samples) array. Expects
+    'pl_eqt' to be filled already (see derived_metrics).
+    """
+    dtype = np.float32 if single_precision else np.float64
+    rng = np.random.default_rng(seed)
+    columns = km.epa_arrays(data_frame)
+    errors = {
+        name: np.asarray(data_frame[name], dtype=np.float64)
+        for name in ["pl_masseerr1", "pl_masseerr2",
+                     "pl_radeerr1", "pl_radeerr2"]
+    }
+
+    n_planets = data_frame.shape[0]
+    step = chunk_size(n_samples, dtype, memory_limit)
+    log.info(f"Monte Carlo: {n_samples} samples for {n_planets} planets "
+             f"in chunks of {step}")
+
+    tsm_percentiles = np.full((len(MC_PERCENTILES), n_planets), np.nan)
+    esm_percentiles = np.full((len(MC_PERCENTILES), n_planets), np.nan)
+
+    for start in range(0, n_planets, step):
+        chunk = slice(start, start + step)
+
+        def point(name: str) -> np.ndarray:
+            return columns[name][chunk].astype(dtype)[:, None]
+
+        mass = split_normal_samples(
+            columns["pl_masse"][chunk], errors["pl_masseerr1"][chunk],
+            errors["pl_masseerr2"][chunk], n_samples, rng, dtype
+        )
+        radius = split_normal_samples(
+            columns["pl_rade"][chunk], errors["pl_radeerr1"][chunk],
+            errors["pl_radeerr2"][chunk], n_samples, rng, dtype
+        )
+
+        # Unphysical draws are excluded from the distributions
+        mass[mass <= 0] = np.nan
+        radius[radius <= 0] = np.nan
+
+        tsm = km.fast_tsm(
+            radius, point("pl_eqt"), mass, point("st_rad"), point("sy_jmag")
+        )
+        esm = km.fast_esm(
+            point("pl_eqt"), point("st_teff"), radius,
+            point("st_rad"), point("sy_kmag")
+        )
+
+        # Planets without any valid draw remain NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            tsm_percentiles[:, chunk] = np.nanpercentile(
+                tsm, MC_PERCENTILES, axis=1
+            )
+            esm_percentiles[:, chunk] = np.nanpercentile(
+                esm, MC_PERCENTILES, axis=1
+            )
+
+    percentile_columns = {}
+    for idx, percentile in enumerate(MC_PERCENTILES):
+        percentile_columns[f"TSM_p{percentile}"] = tsm_percentiles[idx]
+        percentile_columns[f"ESM_p{percentile}"] = esm_percentiles[idx]
+
+    return pd.DataFrame(percentile_columns, index=data_frame.index)
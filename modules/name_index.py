@@ -0,0 +1,109 @@
+from typing import Union
+import numpy as np
+import re
+
+# GLOBALS
+NGRAM_SIZE = 3
+MATCH_THRESHOLD = 0.75      # Minimum Dice similarity of n-gram sets
+PREFIX_ALIASES = {"gliese": "gj", "gl": "gj"}
+
+
+def normalise_name(name: str) -> str:
+    """
+    Reduce a planet name to a comparable key, e.g. "TOI-270 d" and
+    "TOI 270 d" both become "toi270d", "HD 219134 b" and "HD219134b"
+    both become "hd219134b".
+    """
+    key = re.sub(r"[\s\-_.]+", "", str(name).lower())
+
+    # Unify common catalogue prefixes
+    prefix = re.match(r"[a-z]+", key)
+    if prefix is not None and prefix.group() in PREFIX_ALIASES:
+        key = PREFIX_ALIASES[prefix.group()] + key[prefix.end():]
+
+    return key
+
+
+def name_ngrams(key: str, size: int = NGRAM_SIZE) -> set:
+    """Set of character n-grams of a normalised (and padded) key."""
+    padded = f"^{key}$"
+
+    return {padded[idx:idx + size] for idx in range(len(padded) - size + 1)}
+
+
+def designation(key: str) -> tuple:
+    """
+    Numbers and trailing planet letter of a key. Fuzzy matches must
+    agree on these, so that e.g. "TOI-270 c" never matches "TOI-270 d".
+    """
+    letter = key[-1] if key[-1:].isalpha() else ""
+
+    return tuple(re.findall(r"\d+", key)), letter
+
+
+def build_name_index(names: Union[np.ndarray, list]) -> dict:
+    """
+    Build the lookup index for a list of names: normalised keys map
+    onto the original names, and n-grams onto the keys containing them.
+    """
+    keys = {}
+    ngrams = {}
+
+    for name in names:
+        key = normalise_name(name)
+        if key in keys:
+            continue
+        keys[key] = name
+
+        for gram in name_ngrams(key):
+            ngrams.setdefault(gram, set()).add(key)
+
+    return {"keys": keys, "ngrams": ngrams}
+
+
+def match_name(
+        name_index: dict, name: str, threshold: float = MATCH_THRESHOLD
+        ) -> Union[str, None]:
+    """
+    Find the indexed name matching 'name': an identical normalised key
+    first, otherwise the most similar key sharing the designation.
+    Returns None for unresolved names.
+    """
+    key = normalise_name(name)
+    if key in name_index["keys"]:
+        return name_index["keys"][key]
+
+    # Candidates share at least one n-gram with the name
+    grams = name_ngrams(key)
+    shared = {}
+    for gram in grams:
+        for candidate in name_index["ngrams"].get(gram, ()):
+            shared[candidate] = shared.get(candidate, 0) + 1
+
+    best_key, best_score = None, threshold
+    name_designation = designation(key)
+
+    for candidate, count in shared.items():
+        score = 2 * count / (len(grams) + len(name_ngrams(candidate)))
+        if score < best_score:
+            continue
+        if designation(candidate) != name_designation:
+            continue
+        best_key, best_score = candidate, score
+
+    if best_key is None:
+        return None
+
+    return name_index["keys"][best_key]
+
+
+def match_names(
+        name_index: dict, names: Union[np.ndarray, list],
+        threshold: float = MATCH_THRESHOLD
+        ) -> np.ndarray:
+    """Match a list of names (unresolved names are empty strings)."""
+    matches = [match_name(name_index, name, threshold) for name in names]
+
+    return np.array(
+        ["" if match is None else match for match in matches], dtype=object
+    )
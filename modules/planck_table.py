@@ -0,0 +1,138 @@
+from functools import lru_cache
+import modules.kempton_metrics as km
+from typing import Union
+import logging as log
+import pandas as pd
+import numpy as np
+
+# GLOBALS
+TABLE_TEMPERATURES = (100., 60000.)     # Temperature range of the table in K
+TABLE_SIZE = 2048                       # Initial number of grid points
+TABLE_TOLERANCE = 1e-6                  # Maximum relative interpolation error
+TABLE_MAX_SIZE = 2 ** 20
+
+
+def planck_table(wavelengths: tuple) -> dict:
+    """
+    Lookup table of log(B_lambda) on a logarithmic temperature grid for
+    a set of wavelengths (in m). The grid is refined until the relative
+    error of linear log-log interpolation (checked half-way between
+    grid points) stays below TABLE_TOLERANCE. Tables are cached per set
+    of wavelengths.
+    """
+    return cached_planck_table(tuple(float(wl) for wl in wavelengths))
+
+
+@lru_cache(maxsize=32)
+def cached_planck_table(wavelengths: tuple) -> dict:
+    """Build (and cache) the lookup table, see planck_table"""
+    wavelength_arr = np.array(wavelengths)[:, None]
+    log_t_min, log_t_max = np.log(TABLE_TEMPERATURES)
+    size = TABLE_SIZE
+
+    while True:
+        log_t = np.linspace(log_t_min, log_t_max, size)
+        log_b = np.log(km.fast_planck(np.exp(log_t), wavelength_arr))
+
+        # Largest error of the interpolation half-way between nodes
+        log_t_mid = (log_t[1:] + log_t[:-1]) / 2
+        exact = np.log(km.fast_planck(np.exp(log_t_mid), wavelength_arr))
+        interpolated = (log_b[:, 1:] + log_b[:, :-1]) / 2
+        max_error = np.max(np.abs(np.expm1(interpolated - exact)), axis=1)
+
+        if np.all(max_error <= TABLE_TOLERANCE) or size >= TABLE_MAX_SIZE:
+            break
+        size *= 2
+
+    log.info(f"Planck table for {len(wavelengths)} wavelength(s) with "
+             f"{size} temperatures (max. rel. error {max_error.max():.1e})")
+
+    table = {
+        "wavelengths": np.array(wavelengths), "log_t": log_t,
+        "log_b": log_b, "max_error": max_error,
+    }
+    for values in table.values():
+        values.setflags(write=False)
+
+    return table
+
+
+def planck_lookup(
+        temperature: Union[np.ndarray, float], table: dict
+        ) -> np.ndarray:
+    """
+    Interpolated B_lambda (SI units) for all temperatures (in K) and
+    all wavelengths of a table, shape (temperatures, wavelengths). The
+    grid position is found once and shared by all wavelengths.
+    Temperatures outside the table are evaluated exactly.
+    """
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=np.float64))
+    log_t = table["log_t"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_temp = np.log(temperature)
+
+    # Grid position and linear weights (clipped to the table)
+    position = (log_temp - log_t[0]) / (log_t[1] - log_t[0])
+    lower = np.clip(np.floor(np.nan_to_num(position)), 0, log_t.size - 2)
+    lower = lower.astype(np.int64)
+    weight = (position - lower)[:, None]
+
+    log_b = table["log_b"].T
+    radiance = np.exp(
+        log_b[lower] * (1 - weight) + log_b[lower + 1] * weight
+    )
+
+    # Exact values outside of the tabulated temperature range
+    outside = (temperature < TABLE_TEMPERATURES[0]) \
+        | (temperature > TABLE_TEMPERATURES[1])
+    if np.any(outside):
+        radiance[outside] = km.fast_planck(
+            temperature[outside][:, None], table["wavelengths"][None, :]
+        )
+
+    return radiance
+
+
+def esm_wavelengths(
+        pl_eqt: np.ndarray, st_teff: np.ndarray, pl_rade: np.ndarray,
+        st_rad: np.ndarray, sy_kmag: np.ndarray,
+        wavelengths: Union[np.ndarray, tuple] = (km.ESM_WAVELENGTH,)
+        ) -> np.ndarray:
+    """
+    ESM of every planet at every wavelength (in m), with Planck ratios
+    from the lookup table, shape (planets, wavelengths). At the default
+    7.5 microns this is the ESM of Kempton et al. (2018); at other
+    wavelengths the same scale factor is kept as a relative measure.
+    """
+    table = planck_table(tuple(np.atleast_1d(wavelengths)))
+
+    planck_ratio = (planck_lookup(np.asarray(pl_eqt) * 1.1, table)
+                    / planck_lookup(st_teff, table))
+    rel_area = km.fast_transit_depth(
+        np.asarray(pl_rade), np.asarray(st_rad)
+    )[:, None]
+    brightness = 10 ** (- np.asarray(sy_kmag) / 5)[:, None]
+
+    return np.round(4.29e6 * planck_ratio * rel_area * brightness)
+
+
+def band_centre(wavelength_range: pd.Series) -> np.ndarray:
+    """
+    Central wavelength (in m) of the JWST bands given in the cycle
+    files' "λ [μm]" column, e.g. "2.87 – 5.18" or "15". Entries that
+    are not numeric (e.g. MRS "Short") become NaN.
+    """
+    bounds = wavelength_range.astype(str).str.extract(
+        r"^\s*([\d.]+)\s*(?:[–-]\s*([\d.]+))?\s*$"
+    ).astype(float)
+    upper = bounds[1].fillna(bounds[0])
+
+    return ((bounds[0] + upper) / 2).to_numpy() * 1e-6
+
+
+def unique_bands(wavelength_range: pd.Series) -> np.ndarray:
+    """Sorted unique band centres (in m) of a "λ [μm]" column"""
+    centres = band_centre(wavelength_range)
+
+    return np.unique(centres[~np.isnan(centres)])
@@ -0,0 +1,130 @@
+from typing import Union
+import pandas as pd
+import numpy as np
+import re
+
+# GLOBALS
+# A filter spec is a list of conditions that all have to hold. Each
+# condition is a tuple (column, operator[, value]), or a list of
+# alternatives of which one has to hold. Alternatives may again be
+# lists (of conditions that all have to hold), e.g.
+#   [("pl_rade", "<=", 4.),
+#    [("pl_eqt", "not null"), [("st_teff", "not null"),
+#                              ("pl_orbsmax", "not null")]]]
+COMPARISONS = {
+    "<": "__lt__", "<=": "__le__", ">": "__gt__", ">=": "__ge__",
+    "=": "__eq__", "!=": "__ne__",
+}
+NULL_CHECKS = {"null": "IS NULL", "not null": "IS NOT NULL"}
+
+# Selections shared by the plots (applied locally with filter_mask)
+SUB_NEPTUNES = [("pl_rade", "<=", 4.)]
+
+
+def adql_value(value: Union[str, float, int]) -> str:
+    """Literal of a single value in ADQL"""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def compile_condition(condition: tuple) -> str:
+    """ADQL expression of a single (column, operator[, value]) tuple"""
+    column, operator = condition[:2]
+
+    if operator in NULL_CHECKS:
+        return f"{column} {NULL_CHECKS[operator]}"
+
+    elif operator in COMPARISONS:
+        return f"{column} {operator} {adql_value(condition[2])}"
+
+    elif operator == "in":
+        values = ", ".join(adql_value(value) for value in condition[2])
+        return f"{column} IN ({values})"
+
+    raise ValueError(f"FILTER OPERATOR {operator} NOT RECOGNIZED!")
+
+
+def compile_filters(filter_spec: list, junction: str = "AND") -> str:
+    """
+    ADQL condition of a filter spec (see GLOBALS). Nested lists
+    alternate between AND and OR.
+    """
+    inner = "OR" if junction == "AND" else "AND"
+    parts = []
+
+    for condition in filter_spec:
+        if isinstance(condition, list):
+            parts.append(f"({compile_filters(condition, inner)})")
+        else:
+            parts.append(compile_condition(condition))
+
+    return f" {junction} ".join(parts)
+
+
+def add_where(adql_query: str, filter_spec: list) -> str:
+    """
+    Push a filter spec into an existing ADQL query: appended to its
+    WHERE clause with AND (or added as new WHERE clause), in front of
+    any trailing ORDER BY.
+    """
+    if len(filter_spec) == 0:
+        return adql_query
+
+    condition = compile_filters(filter_spec)
+
+    # Split off a trailing ORDER BY
+    adql_query = adql_query.strip()
+    order = re.search(r"\s+ORDER\s+BY\s+", adql_query, flags=re.IGNORECASE)
+    tail = ""
+    if order is not None:
+        adql_query, tail = adql_query[:order.start()], \
+            adql_query[order.start():]
+
+    where = list(re.finditer(r"\bWHERE\b", adql_query, flags=re.IGNORECASE))
+    if len(where) == 0:
+        return f"{adql_query} WHERE {condition}{tail}"
+
+    head = adql_query[:where[-1].start()]
+    existing = adql_query[where[-1].end():].strip()
+
+    return f"{head}WHERE ({existing}) AND {condition}{tail}"
+
+
+def condition_mask(data_frame: pd.DataFrame, condition: tuple) -> np.ndarray:
+    """Local counterpart of compile_condition (NULL never compares)"""
+    column, operator = condition[:2]
+    values = data_frame[column]
+
+    if operator in NULL_CHECKS:
+        not_null = values.notna().to_numpy()
+        return not_null if operator == "not null" else ~not_null
+
+    elif operator in COMPARISONS:
+        compared = getattr(values, COMPARISONS[operator])(condition[2])
+        return compared.to_numpy(dtype=bool) & values.notna().to_numpy()
+
+    elif operator == "in":
+        return values.isin(condition[2]).to_numpy()
+
+    raise ValueError(f"FILTER OPERATOR {operator} NOT RECOGNIZED!")
+
+
+def filter_mask(
+        data_frame: pd.DataFrame, filter_spec: list, junction: str = "AND"
+        ) -> np.ndarray:
+    """Boolean row mask of a filter spec (see compile_filters)"""
+    inner = "OR" if junction == "AND" else "AND"
+    mask = np.full(data_frame.shape[0], junction == "AND")
+
+    for condition in filter_spec:
+        if isinstance(condition, list):
+            part = filter_mask(data_frame, condition, inner)
+        else:
+            part = condition_mask(data_frame, condition)
+
+        mask = mask & part if junction == "AND" else mask | part
+
+    return mask
+
@@ -0,0 +1,121 @@
+from typing import Union
+import logging as log
+import polars as pl
+import time
+import os
+
+# GLOBALS
+VERSION_DIR = "output/target_query/versions"
+VERSION_FORMAT = "%Y%m%dT%H%M%SZ"   # UTC, sorts chronologically
+DIFF_KEY = "planet_name"
+MISSING_VALUES = ["NaN", "nan", ""]  # Placeholders of failed queries
+
+
+def new_version() -> str:
+    """Identifier of a new snapshot version (current UTC time)"""
+    return time.strftime(VERSION_FORMAT, time.gmtime())
+
+
+def store_version(
+        frame: pl.DataFrame, name: str, version: str,
+        version_dir: str = VERSION_DIR
+        ) -> str:
+    """Store one query result as part of a snapshot version"""
+    os.makedirs(f"{version_dir}/{version}", exist_ok=True)
+    data_file = f"{version_dir}/{version}/{name}.parquet"
+    frame.write_parquet(data_file)
+
+    return data_file
+
+
+def list_versions(version_dir: str = VERSION_DIR) -> list[str]:
+    """All stored snapshot versions, oldest first"""
+    if not os.path.isdir(version_dir):
+        return []
+
+    return sorted(
+        entry for entry in os.listdir(version_dir)
+        if os.path.isdir(f"{version_dir}/{entry}")
+    )
+
+
+def load_version(
+        version: str, key: str = DIFF_KEY, version_dir: str = VERSION_DIR
+        ) -> pl.DataFrame:
+    """All query results of a snapshot version, one row per key"""
+    version_path = f"{version_dir}/{version}"
+    assert os.path.isdir(version_path), \
+        f"SNAPSHOT VERSION {version} NOT RECOGNIZED!"
+
+    frames = [
+        pl.read_parquet(f"{version_path}/{name}")
+        for name in sorted(os.listdir(version_path))
+        if name.endswith(".parquet")
+    ]
+
+    return pl.concat(frames, how="diagonal_relaxed").unique(
+        subset=[key], keep="first", maintain_order=True
+    )
+
+
+def long_format(frame: pl.DataFrame, key: str = DIFF_KEY) -> pl.DataFrame:
+    """
+    One row per key and parameter, with values as text (so that all
+    parameters share one column) and missing values as null.
+    """
+    parameters = [name for name in frame.columns if name != key]
+
+    return frame.select(
+        [pl.col(key)] + [pl.col(name).cast(pl.Utf8) for name in parameters]
+    ).unpivot(
+        index=key, variable_name="parameter", value_name="value"
+    ).with_columns(
+        pl.when(pl.col("value").is_in(MISSING_VALUES))
+        .then(None).otherwise(pl.col("value")).alias("value")
+    )
+
+
+def diff_versions(
+        old_frame: pl.DataFrame, new_frame: pl.DataFrame,
+        key: str = DIFF_KEY
+        ) -> pl.DataFrame:
+    """
+    Parameters that changed, were added or removed per key between two
+    snapshots, from a single outer join of their long formats.
+    """
+    joined = long_format(old_frame, key).join(
+        long_format(new_frame, key), on=[key, "parameter"], how="full",
+        suffix="_new", coalesce=True
+    ).rename({"value": "old_value", "value_new": "new_value"})
+
+    old_missing = pl.col("old_value").is_null()
+    new_missing = pl.col("new_value").is_null()
+
+    change = pl.when(old_missing & ~new_missing).then(pl.lit("added")) \
+        .when(~old_missing & new_missing).then(pl.lit("removed")) \
+        .when(pl.col("old_value") != pl.col("new_value")) \
+        .then(pl.lit("changed")).otherwise(None).alias("change")
+
+    return joined.with_columns(change).filter(
+        pl.col("change").is_not_null()
+    ).sort([key, "parameter"])
+
+
+def planets_to_replot(
+        diff: pl.DataFrame, parameters: Union[list, None] = None,
+        key: str = DIFF_KEY
+        ) -> pl.DataFrame:
+    """
+    Keys with differences (optionally only in the plotted 'parameters'),
+    with their number of changed parameters.
+    """
+    if parameters is not None:
+        diff = diff.filter(pl.col("parameter").is_in(parameters))
+
+    replot = diff.group_by(key).agg(
+        pl.len().alias("n_changes"),
+        pl.col("parameter").str.join(", ").alias("parameters"),
+    ).sort(key)
+    log.info(f"{replot.shape[0]} planets with changed parameters")
+
+    return replot
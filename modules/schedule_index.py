@@ -0,0 +1,132 @@
+import pandas as pd
+import numpy as np
+
+# GLOBALS
+OBSERVED_COLUMN = "Observed Date"
+RELEASE_COLUMN = "Observation Date(s) [MM/DD/YY]"
+
+
+def build_schedule_index(
+        observations: pd.DataFrame,
+        observed_column: str = OBSERVED_COLUMN,
+        release_column: str = RELEASE_COLUMN
+) -> dict:
+    """
+    Sorted lookup structures over exploded observations (see
+    target_schedule.read_all_cycles): observations ordered by
+    observation and by release date, and program windows (first to
+    last observation per proposal) ordered by start date.
+    """
+    by_observed = observations.sort_values(
+        observed_column, kind="stable", ignore_index=True
+    )
+    by_release = observations.sort_values(
+        release_column, kind="stable", ignore_index=True
+    )
+
+    programs = observations.groupby("Proposal ID").agg(
+        start=(observed_column, "min"), end=(observed_column, "max"),
+        targets=("Target Name", "unique"),
+        n_obs=("Target Name", "size"),
+    ).sort_values("start", kind="stable").reset_index()
+
+    return {
+        "by_observed": by_observed,
+        "observed": by_observed[observed_column].to_numpy(),
+        "by_release": by_release,
+        "release": by_release[release_column].to_numpy(),
+        "programs": programs,
+        "program_start": programs["start"].to_numpy(),
+        "program_end": programs["end"].to_numpy(),
+        "observed_column": observed_column,
+    }
+
+
+def date_window(sorted_dates: np.ndarray, start, end) -> slice:
+    """Positions of all dates in [start, end] (binary search)"""
+    lower = np.searchsorted(sorted_dates, np.datetime64(start), "left")
+    upper = np.searchsorted(sorted_dates, np.datetime64(end), "right")
+
+    return slice(lower, upper)
+
+
+def observed_between(schedule_index: dict, start, end) -> pd.DataFrame:
+    """Observations taking place between two dates (inclusive)"""
+    window = date_window(schedule_index["observed"], start, end)
+
+    return schedule_index["by_observed"].iloc[window]
+
+
+def released_between(schedule_index: dict, start, end) -> pd.DataFrame:
+    """Observations whose EAP ends between two dates (inclusive)"""
+    window = date_window(schedule_index["release"], start, end)
+
+    return schedule_index["by_release"].iloc[window]
+
+
+def programs_active(schedule_index: dict, start, end) -> pd.DataFrame:
+    """Programs whose observation window intersects [start, end]"""
+    # Only programs starting before the end of the window can intersect
+    candidates = np.searchsorted(
+        schedule_index["program_start"], np.datetime64(end), "right"
+    )
+    active = schedule_index["program_end"][:candidates] \
+        >= np.datetime64(start)
+
+    return schedule_index["programs"].iloc[:candidates].loc[active]
+
+
+def overlapping_programs(schedule_index: dict) -> pd.DataFrame:
+    """
+    All pairs of programs with overlapping observation windows. With
+    programs sorted by start date, the partners of each program are
+    found by binary search for its end date.
+    """
+    programs = schedule_index["programs"]
+    starts = schedule_index["program_start"]
+    ends = schedule_index["program_end"]
+
+    # Program i overlaps all later-starting programs i < j < stop[i]
+    position = np.arange(starts.size)
+    stop = np.searchsorted(starts, ends, "right")
+    partners = stop - position - 1
+
+    first = np.repeat(position, partners)
+    group_start = np.repeat(np.cumsum(partners) - partners, partners)
+    second = first + 1 + (np.arange(first.size) - group_start)
+
+    pairs = pd.DataFrame({
+        "pid_1": programs["Proposal ID"].to_numpy()[first],
+        "pid_2": programs["Proposal ID"].to_numpy()[second],
+        "overlap_start": starts[second],
+        "overlap_end": np.minimum(ends[first], ends[second]),
+    })
+
+    return pairs
+
+
+def repeated_visits(schedule_index: dict, max_days: float) -> pd.DataFrame:
+    """
+    Consecutive observations of the same target that are at most
+    'max_days' apart.
+    """
+    observed_column = schedule_index["observed_column"]
+    visits = schedule_index["by_observed"].sort_values(
+        ["Target Name", observed_column], kind="stable", ignore_index=True
+    )
+
+    names = visits["Target Name"].to_numpy()
+    dates = visits[observed_column].to_numpy()
+
+    gap = (dates[1:] - dates[:-1]) / np.timedelta64(1, "D")
+    repeat = (names[1:] == names[:-1]) & (gap <= max_days)
+    positions = np.nonzero(repeat)[0]
+
+    return pd.DataFrame({
+        "Target Name": names[1:][repeat],
+        "first_visit": dates[:-1][repeat],
+        "second_visit": dates[1:][repeat],
+        "gap_days": gap[repeat],
+        "pid_1": visits["Proposal ID"].to_numpy()[positions],
+        "pid_2": visits["Proposal ID"].to_numpy()[positions + 1],
+    })
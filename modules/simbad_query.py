@@ -1,16 +1,162 @@
 from astroquery.simbad import Simbad
 from typing import Union
+import logging as log
+import modules.name_index as ni
 import pandas as pd
 import numpy as np
+import json
+import time
+import os
 
+# GLOBALS
+ALIAS_CACHE = "output/.simbad_cache/simbad_aliases.json"
+SIMBAD_BATCH_SIZE = 500
+UNRESOLVED_TTL = 7 * 24 * 3600  # Seconds until unknown names are retried
 
-def query_simbad_names(name_list: Union[np.ndarray, list]) -> np.ndarray:
+
+def query_simbad_names(
+        name_list: Union[np.ndarray, list], refresh: bool = False
+        ) -> np.ndarray:
+    """
+    Simple SIMBAD query to unify naming-convention when comparing lists.
+    Names are resolved in bulk and through the persistent alias cache;
+    names SIMBAD does not know are returned unchanged.
+    """
+    # Cache keys are strings (this also covers empty csv-cells)
+    names = [str(name) for name in name_list]
+    aliases = resolve_simbad_ids(names, refresh=refresh)
+
+    return np.array([aliases[name] for name in names], dtype=str)
+
+
+def resolve_simbad_ids(
+        name_list: Union[np.ndarray, list], refresh: bool = False,
+        cache_file: str = ALIAS_CACHE, ttl: float = UNRESOLVED_TTL
+        ) -> dict:
+    """
+    Map names to their SIMBAD main identifier (or to themselves, if
+    SIMBAD does not know them). Only names missing from the alias cache
+    are sent to SIMBAD, in batches of bulk queries, unless 'refresh'
+    forces all names to be resolved again. Resolved names are cached
+    permanently, names SIMBAD answered without a match for 'ttl'
+    seconds. Names of failed batches are not cached at all.
+    """
+    alias_cache = read_alias_cache(cache_file)
+    resolved = alias_cache["resolved"]
+    now = time.time()
+
+    # Names that are unknown to SIMBAD are only retried after the TTL
+    unresolved = {
+        name: checked for name, checked in alias_cache["unresolved"].items()
+        if now - checked <= ttl
+    }
+
+    missing = [
+        name for name in dict.fromkeys(name_list)
+        if refresh or (name not in resolved and name not in unresolved)
+    ]
+
+    if len(missing) > 0:
+        log.info(f"Resolving {len(missing)} name(s) through SIMBAD")
+
+        for idx in range(0, len(missing), SIMBAD_BATCH_SIZE):
+            batch = missing[idx:idx + SIMBAD_BATCH_SIZE]
+            batch_aliases = query_simbad_batch(batch)
+
+            # Failed batches are retried in the next run
+            if batch_aliases is None:
+                continue
+
+            for name in batch:
+                if name in batch_aliases:
+                    resolved[name] = batch_aliases[name]
+                    unresolved.pop(name, None)
+                else:
+                    resolved.pop(name, None)
+                    unresolved[name] = now
+
+        write_alias_cache(
+            {"resolved": resolved, "unresolved": unresolved}, cache_file
+        )
+
+    return {name: resolved.get(name, name) for name in name_list}
+
+
+def query_simbad_batch(name_batch: list) -> Union[dict, None]:
+    """
+    Bulk SIMBAD query for a batch of names, returning the main
+    identifier of every resolved name. Names missing from the result
+    are unknown to SIMBAD (this will work e.g. for the TrES-planets,
+    which are then compared by their initial name). Returns None if
+    the query failed or its results cannot be assigned to the names.
+    """
+    try:
+        result_table = Simbad.query_objects(name_batch)
+    except TypeError:
+        # Raised by older astroquery versions if no object is resolved
+        log.warning("SIMBAD query failed, names are not cached")
+        return None
+
+    if result_table is None or len(result_table) == 0:
+        log.warning("SIMBAD returned no results, names are not cached")
+        return None
+
+    # Match result rows to the queried names (the column naming depends
+    # on the astroquery version, upper case before 0.4.8)
+    columns = {name.lower(): name for name in result_table.colnames}
+    main_ids = np.array(result_table[columns["main_id"]], dtype=str)
+
+    if "user_specified_id" in columns:
+        queried = np.array(
+            result_table[columns["user_specified_id"]], dtype=str
+        )
+    elif "script_number_id" in columns:
+        script_ids = np.array(
+            result_table[columns["script_number_id"]], dtype=int
+        )
+        queried = np.array(name_batch, dtype=object)[script_ids - 1]
+    elif len(result_table) == len(name_batch):
+        queried = np.array(name_batch, dtype=object)
+    else:
+        log.warning("Cannot match SIMBAD results to queried names")
+        return None
+
+    return {
+        name: main_id for name, main_id in zip(queried, main_ids)
+        if main_id.strip() != ""
+    }
+
+
+def read_alias_cache(cache_file: str = ALIAS_CACHE) -> dict:
     """
-    Simple SIMBAD query to unify naming-convention when comparing lists
+    Read the persistent alias cache: resolved names (name -> SIMBAD ID)
+    and unresolved names (name -> time of the last check).
     """
-    result_table = Simbad.query_objects(name_list)
+    alias_cache = {"resolved": {}, "unresolved": {}}
+    if not os.path.isfile(cache_file):
+        return alias_cache
+
+    with open(cache_file, "r") as file:
+        content = json.load(file)
+
+    # Caches of the former flat layout also hold failed lookups
+    if "resolved" not in content:
+        log.warning(f"Discarding alias cache {cache_file} of old layout")
+        return alias_cache
+
+    return alias_cache | content
 
-    return np.array(result_table["MAIN_ID"], dtype=str)
+
+def write_alias_cache(
+        alias_cache: dict, cache_file: str = ALIAS_CACHE
+        ) -> None:
+    """Write the persistent alias cache (see read_alias_cache)."""
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+    with open(cache_file, "w") as file:
+        json.dump(alias_cache, file, indent=1, sort_keys=True)
+
+    return None
 
 
 def read_targets(file_name: str, column_name: str):
@@ -23,42 +169,88 @@ def read_targets(file_name: str, column_name: str):
     return col_of_interest
 
 
-def target_comparison(raw_query: pd.DataFrame) -> None:
+def target_comparison(
+        raw_query: pd.DataFrame, use_simbad: bool = True,
+        refresh: bool = False
+        ) -> None:
     """
     Compares names in the EPA query list with the ARIEL T2 target list
-    from Billy Edwards, and with my own JWST target lists.
+    from Billy Edwards, and with my own JWST target lists. Names are
+    matched offline first, only unresolved names are compared through
+    their SIMBAD identifiers ('refresh' bypasses the alias cache).
     """
     # Insert ARIEL and JWST column
     raw_query["ARIEL"] = None
     raw_query["JWST"] = None
-    
+
     # Comparison libraries
     ariel = read_targets("ArielT2MCS_11Apr2023.csv", "Planet Name")
     jwst_cycle1 = read_targets("JWST_cycle1_targets.csv", "Target Name")
     jwst_cycle2 = read_targets("JWST_cycle2_targets.csv", "Target Name")
-    jwst = np.unique(np.append(jwst_cycle1, jwst_cycle2))
-
-    # Query SIMBAD for common names (and hold for arbitrary amount of
-    # time, to make sure queries are finished)
-    ariel_simbad = query_simbad_names(ariel)
-    jwst_simbad = query_simbad_names(jwst)
-
-    for planet in raw_query["pl_name"]:
-        try:
-            unique_id = np.array(
-                Simbad.query_objects([planet])["MAIN_ID"], dtype=str
-            )
-        except TypeError:
-            # This step supplements the initial name from the JWST or
-            # Ariel files into the comparison, just in case they match
-            # up (without first unifying them through SIMBAD). This
-            # will work e.g. for the TrES-planets
-            unique_id = planet
-
-        if unique_id in ariel or unique_id in ariel_simbad:
-            raw_query.loc[raw_query["pl_name"] == planet, "ARIEL"] = True
-
-        if unique_id in jwst or unique_id in jwst_simbad:
-            raw_query.loc[raw_query["pl_name"] == planet, "JWST"] = True
+    jwst = np.unique(np.append(jwst_cycle1, jwst_cycle2).astype(str))
+
+    # Local name index of all archive planets, SIMBAD identifiers of
+    # the archive planets are shared between both lists
+    planets = raw_query["pl_name"]
+    name_index = ni.build_name_index(planets.to_numpy())
+    archive_ids = {}
+
+    ariel_set = match_to_archive(
+        name_index, ariel, use_simbad, refresh, archive_ids
+    )
+    jwst_set = match_to_archive(
+        name_index, jwst, use_simbad, refresh, archive_ids
+    )
+
+    raw_query.loc[planets.isin(ariel_set), "ARIEL"] = True
+    raw_query.loc[planets.isin(jwst_set), "JWST"] = True
 
     return None
+
+
+def match_to_archive(
+        name_index: dict, name_list: Union[np.ndarray, list],
+        use_simbad: bool = True, refresh: bool = False,
+        archive_ids: Union[dict, None] = None
+        ) -> set:
+    """
+    Set of archive names matching a target list. Names that cannot be
+    matched locally are compared through SIMBAD: their main identifiers
+    are matched against the identifiers of the archive names (bulk
+    query and alias cache), and against the archive names themselves.
+    'archive_ids' holds the normalised archive identifiers between
+    calls (filled on first use).
+    """
+    names = np.array([str(name) for name in name_list], dtype=object)
+    matches = ni.match_names(name_index, names)
+
+    unresolved = names[matches == ""]
+    if use_simbad and unresolved.size > 0:
+        log.info(f"{unresolved.size} name(s) not matched locally, "
+                 f"falling back to SIMBAD")
+        simbad_ids = query_simbad_names(unresolved, refresh)
+
+        if archive_ids is None:
+            archive_ids = {}
+        if len(archive_ids) == 0:
+            archive_names = list(name_index["keys"].values())
+            archive_ids.update({
+                ni.normalise_name(simbad_id): name for simbad_id, name
+                in zip(query_simbad_names(archive_names, refresh),
+                       archive_names)
+            })
+
+        simbad_matches = np.array([
+            archive_ids.get(ni.normalise_name(simbad_id), "")
+            for simbad_id in simbad_ids
+        ], dtype=object)
+
+        # Identifiers unknown among the archive planets may still match
+        # an archive name directly
+        missing = simbad_matches == ""
+        simbad_matches[missing] = ni.match_names(
+            name_index, simbad_ids[missing]
+        )
+        matches = np.append(matches, simbad_matches)
+
+    return set(matches[matches != ""])
@@ -4,6 +4,21 @@ import pandas as pd
 import matplotlib as mpl
 from typing import Union
 
+# GLOBALS
+# Kopparapu et al. (2013, 2014) parameters, organized by oi, ci, co, oo
+# estimates: S_eff of the Sun and coefficients of (T - 5780 K) ** 1..4
+# PLEASE NOTE THE ERRATUM TO THE ORIGINAL KOPPARAPU (2013) PAPER!
+HZ_BOUNDARIES = ["oi", "ci", "co", "oo"]
+HZ_SEFF_SUN = np.array([1.7763, 1.0385, 0.3507, 0.3207])
+HZ_PARAMETERS = np.array([
+    [1.4335e-4, 3.3954e-9, -7.6364e-12, -1.1950e-15],
+    [1.2456e-4, 1.4612e-8, -7.6345e-12, -1.7511e-15],
+    [5.9578e-5, 1.6707e-9, -3.0058e-12, -5.1925e-16],
+    [5.4471e-5, 1.5275e-9, -2.1709e-12, -3.8282e-16],
+])
+HZ_MEMO = {}
+HZ_MEMO_SIZE = 16
+
 
 def rc_setup():
     """Generalized plot attributes"""
@@ -161,14 +176,43 @@ def combine_transit_eclipse(transit_dict, eclipse_dict):
 
 def plotable_hz_bounds(temp=np.linspace(2600, 7200, 5000),
                        lbol=np.linspace(0.01, 1, 5000)) -> dict:
-    """Returns a dictionary of inner and outer HZ boundary distances."""
-    bounds = ["oi", "ci", "co", "oo"]
-    hz_bounds = {
-        key: habitable_zone_distance(temp, lbol, key)
-        for key in bounds
-    }
+    """
+    Returns a dictionary of inner and outer HZ boundary distances.
+    Results are memoized per (temperature, luminosity) grid, so that
+    repeated plot backdrops do not recompute them.
+    """
+    temp = np.asarray(temp, dtype=np.float64)
+    lbol = np.asarray(lbol, dtype=np.float64)
+    memo_key = (
+        temp.shape, lbol.shape,
+        hash(temp.tobytes()), hash(lbol.tobytes())
+    )
+
+    if memo_key not in HZ_MEMO:
+        # Simple bounded memo, dropping the oldest grid first
+        if len(HZ_MEMO) >= HZ_MEMO_SIZE:
+            HZ_MEMO.pop(next(iter(HZ_MEMO)))
+
+        distances = habitable_zone_boundaries(temp, lbol)
+        distances.setflags(write=False)
+        HZ_MEMO[memo_key] = dict(zip(HZ_BOUNDARIES, distances))
+
+    return dict(HZ_MEMO[memo_key])
 
-    return hz_bounds
+
+def habitable_zone_boundaries(effect_temp, lum) -> np.ndarray:
+    """
+    All four HZ boundary distances (oi, ci, co, oo) at once, following
+    Kopparapu et al. (2013, 2014).
+
+    :param effect_temp: NDARRAY, Stellar temperature in Kelvin
+    :param lum: NDARRAY, Stellar bolometric luminosity in solar units
+
+    :return: NDARRAY, HZ distances in AU, shape (4, *input shape)
+    """
+    s_eff = effective_flux_all(effect_temp)
+
+    return np.sqrt(np.asarray(lum) / s_eff)
 
 
 def habitable_zone_distance(effect_temp, lum, est_ident):
@@ -181,29 +225,15 @@ def habitable_zone_distance(effect_temp, lum, est_ident):
 
     :return: NDARRAY, HZ distance in AU
     """
-
-    # Determine valid indicators
-    valid_ind = ["oi", "ci", "co", "oo"]
-    est_indices = dict(zip(valid_ind, range(4)))
-
     # SANITY CHECK: indicator for estimate must exist
-    assert est_ident.lower() in ["oi", "ci", "co", "oo"], \
+    assert est_ident.lower() in HZ_BOUNDARIES, \
         f"INDICATOR {est_ident} FOR ESTIMATION METHOD NOT RECOGNIZED!"
 
-    # Parameter matrix organized by oi, ci, co, oo estimates
-    # PLEASE NOTE THE ERRATUM TO THE ORIGINAL KOPPARAPU (2013) PAPER!
-    param = np.array([
-        [1.4335e-4, 3.3954e-9, -7.6364e-12, -1.1950e-15],
-        [1.2456e-4, 1.4612e-8, -7.6345e-12, -1.7511e-15],
-        [5.9578e-5, 1.6707e-9, -3.0058e-12, -5.1925e-16],
-        [5.4471e-5, 1.5275e-9, -2.1709e-12, -3.8282e-16],
-    ])
-
     # Set correct param-subindex according to est_ident
-    est_index = est_indices[est_ident]
+    est_index = HZ_BOUNDARIES.index(est_ident.lower())
 
     # Call the S_eff calculation function with correct parameters
-    s_eff = effective_flux(param[est_index], effect_temp, est_index)
+    s_eff = effective_flux(HZ_PARAMETERS[est_index], effect_temp, est_index)
 
     # Calculate distance
     distance = np.sqrt(lum / s_eff)
@@ -211,16 +241,30 @@ def habitable_zone_distance(effect_temp, lum, est_ident):
     return distance
 
 
+def effective_flux_all(effect_temp) -> np.ndarray:
+    """
+    S_eff of all four boundaries, shape (4, *input shape). The shared
+    temperature offset is evaluated with Horner's scheme for all
+    boundaries at once.
+    """
+    t_star = np.asarray(effect_temp, dtype=np.float64) - 5780
+    expand = (slice(None),) + (None,) * t_star.ndim
+
+    # Horner: t * (a + t * (b + t * (c + t * d)))
+    polynomial = HZ_PARAMETERS[:, 3][expand]
+    for order in [2, 1, 0]:
+        polynomial = HZ_PARAMETERS[:, order][expand] + t_star * polynomial
+
+    return HZ_SEFF_SUN[expand] + t_star * polynomial
+
+
 def effective_flux(param_list, effect_temp, estimation_index):
     """Intermediate step in HZ calculation"""
-    s_effsun = [1.7763, 1.0385, 0.3507, 0.3207]
+    t_star = np.asarray(effect_temp, dtype=np.float64) - 5780
 
-    # Temperature array consisting of powers 1 to 4
-    temp = np.array(
-        [(effect_temp - 5780) ** (i + 1) for i in range(4)]
-    )
+    # Horner evaluation of the polynomial in powers 1 to 4
+    polynomial = param_list[3]
+    for order in [2, 1, 0]:
+        polynomial = param_list[order] + t_star * polynomial
 
-    # Transpose the temperature-power array to have each row be a list
-    # of Temp ** 1 to Temp ** 4, and then calculate the dot-product
-    # with the parameter list vector
-    return s_effsun[estimation_index] + temp.T @ param_list
+    return HZ_SEFF_SUN[estimation_index] + t_star * polynomial
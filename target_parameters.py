@@ -2,17 +2,18 @@ import matplotlib.pyplot as plt
 import modules.epa_query as eq
 import modules.epa_util as eu
 import modules.epa_custom_plots as ec
+import modules.query_filters as qf
 import logging as log
 import sys
 from typing import Union
 import numpy as np
 import pandas as pd
-import copy as cp
 import modules.util as u
 
 # GLOBALS
 DATA_DIR = "data"
 QUERY = False
+OFFLINE_QUERY = False   # Use the local EPA snapshot
 
 
 def main():
@@ -24,6 +25,8 @@ def main():
         level=log.INFO
     )
 
+    eq.OFFLINE = OFFLINE_QUERY
+
     # Re-query only if necessary
     if QUERY is True:
         print("\nFresh query to NASA EPA\n")
@@ -73,31 +76,39 @@ def construct_new_df(
         epa_df: pd.DataFrame
 ) -> pd.DataFrame:
     """Concatenate data frames from csv file and EPA query"""
-    # Instantiate the new data frame taking necessary values from the
-    # csv-file and appending empty columns with names from the EPA
-    # data frame
-    new_df = cp.deepcopy(csv_df[[
+    # Necessary values from the csv-file, extended by the EPA values
+    # through a left join on the target name
+    csv_columns = [
         "Target Name", "Instrument", "Type", "ObsCycle", "EAP [mon]"
-    ]])
-    epa_cols = epa_df.columns
-    for column in epa_cols:
-        new_df[column] = np.nan
-
-    # Fill in the new data frame by using the values from the EPA
-    for idx in range(epa_df.shape[0]):
-        # EPA query list will give only one planet per row
-        epa_subframe = epa_df.iloc[idx]
-
-        # Match with row indices from the csv data frame
-        csv_idxs = new_df.loc[
-            new_df["Target Name"] == epa_subframe["pl_name"]
-        ].index.to_list()
-
-        # Fill in queries values (and DON'T use chained indexing)
-        for match_idx in csv_idxs:
-            for column in epa_cols:
-                # Use "at" to actually assign cell with mixed indexing
-                new_df.at[match_idx, column] = epa_subframe.loc[column]
+    ]
+
+    # Planet names carry the EPA name, or the renamed one from
+    # epa_query.QUERY_PARAMETERS
+    epa_key = "pl_name" if "pl_name" in epa_df.columns else "planet_name"
+
+    # EPA query list should give only one planet per row (for duplicates
+    # the last entry is used)
+    epa_unique = epa_df.drop_duplicates(subset=[epa_key], keep="last")
+
+    new_df = csv_df[csv_columns].merge(
+        epa_unique, how="left", left_on="Target Name", right_on=epa_key,
+        suffixes=("", "_epa")
+    )
+
+    # Keep the row labels of the csv data frame
+    new_df.index = csv_df.index
+
+    # EPA numbers are floats (like the formerly NaN-initialised
+    # columns), also if every target was found
+    numeric_columns = [
+        column for column in epa_unique.columns
+        if column not in csv_columns
+        and pd.api.types.is_numeric_dtype(epa_unique[column])
+        and not pd.api.types.is_bool_dtype(epa_unique[column])
+    ]
+    new_df = new_df.astype(
+        {column: np.float64 for column in numeric_columns}
+    )
 
     return new_df
 
@@ -163,10 +174,11 @@ def parameter_plot_fill(
 def specialised_plot(total_df: pd.DataFrame, savename: str):
     """Specialised plot wrapper"""
     # Split into sub-Neptunes and rest
-    not_interest = total_df.loc[total_df["pl_rade"] > 4.0].drop_duplicates(
-        subset=["pl_name"]
-    )
-    of_interest = total_df.loc[total_df["pl_rade"] <= 4.0].drop_duplicates(
+    sub_neptunes = qf.filter_mask(total_df, qf.SUB_NEPTUNES)
+    not_interest = total_df.loc[
+        ~sub_neptunes & total_df["pl_rade"].notna()
+    ].drop_duplicates(subset=["pl_name"])
+    of_interest = total_df.loc[sub_neptunes].drop_duplicates(
         subset=["pl_name"]
     )
 
@@ -0,0 +1,54 @@
+import modules.query_versions as qv
+import polars as pl
+import argparse
+
+# GLOBALS
+OUTPUT = "output/target_query"
+
+
+def main():
+    arguments = parse_arguments()
+
+    # Compare the two latest versions by default
+    versions = qv.list_versions()
+    if arguments.old is None:
+        assert len(versions) > 1, \
+            "AT LEAST TWO SNAPSHOT VERSIONS ARE NEEDED FOR A DIFF!"
+        old_version, new_version = versions[-2:]
+    else:
+        old_version = arguments.old
+        new_version = arguments.new or versions[-1]
+
+    diff = qv.diff_versions(
+        qv.load_version(old_version), qv.load_version(new_version)
+    )
+    replot = qv.planets_to_replot(diff, arguments.parameters)
+
+    # Planets to re-plot, and the full list of differences
+    diff.write_csv(f"{OUTPUT}/diff_{old_version}_{new_version}.csv")
+    replot.write_csv(f"{OUTPUT}/replot_planets.csv")
+
+    with pl.Config(tbl_rows=-1, fmt_str_lengths=40):
+        print(f"\n{old_version} -> {new_version}\n")
+        print(diff.group_by("change").len().sort("change"))
+        print(replot)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Command line interface for diffs between query snapshots"""
+    parser = argparse.ArgumentParser(
+        description="Differences of EPA parameters between two "
+                    "target_query.py runs"
+    )
+    parser.add_argument("old", nargs="?", help="older snapshot version")
+    parser.add_argument("new", nargs="?", help="newer snapshot version")
+    parser.add_argument(
+        "--parameters", nargs="+", default=None,
+        help="only re-plot planets with changes in these parameters"
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import asyncio
 
 import logging
 import numpy as np
@@ -6,26 +7,64 @@ import polars as pl
 import typing as tp
 
 import modules.epa_query as epa
+import modules.hz_classification as hz
+import modules.query_versions as qv
 import modules.logging as log
 
 
 # GLOBALS
 INPUT = "data/target_query"
 OUTPUT = "output/target_query"
+REFRESH_QUERY = False
+OFFLINE_QUERY = False      # Use the local EPA snapshot (target_snapshot.py)
+QUERY_MODE = "inline"
+QUERY_TABLE = "pscomppars"  # Or "ps" for one self-consistent solution
+MAX_CONCURRENT_QUERIES = 3
+HZ_MC_SAMPLES = 1000
+
+# Columns of the reduced output files
+REDUCED_PARAMETERS = [
+    # Initial parameters
+    "planet_name", "jwst_instrument", "jwst_filter", "jwst_dispersion",
+    "type", "num_obs", "jwst_cycle", "pid", "eap_months",
+    # Planet parameters
+    "radius_rearth", "mass_mearth", "period_day", "sma_au",
+    "eq-temp_kelvin", "hz_zone", "hz_conservative_prob",
+    "hz_optimistic_prob",
+    # Star parameters
+    "host_name", "system_size", "star-teff_kelvin",
+    "star-radius_rsol", "star-mass_msol", "star-log10-lbol_lsol",
+    "star-age_ga", "star-rotvel_kms",
+]
+
+# Query all parameters (including uncertainties and references) for
+# the full output files, or only what the reduced files and the HZ
+# classification need
+FULL_PARAMETERS = True
+HZ_PARAMETERS = [
+    "star-teff_errpos", "star-teff_errneg",
+    "star-log10-lbol_errpos", "star-log10-lbol_errneg",
+]
+
 logging.getLogger(__name__)
 
 
 def main():
     # Simple logger
     log.configure_logger(f"{OUTPUT}/target_query.log")
+    epa.OFFLINE = OFFLINE_QUERY
+
+    # Query all cycle files concurrently (each cycle frame is saved as
+    # soon as its query returns), query results are kept as one version
+    version = qv.new_version()
+    cycle_frames = asyncio.run(
+        handle_all_files(sorted(os.listdir(INPUT)), version)
+    )
 
     # Start collecting query results
     query_all_cycles = []
 
-    # Loop over individual cycle files:
-    for filename in sorted(os.listdir(INPUT)):
-        cycle_frame = handle_single_file(filename)
-
+    for cycle_frame in cycle_frames:
         # Need to recast the data type of "system size"
         cycle_frame = cycle_frame.with_columns(
             pl.col("system_size").cast(pl.Float64).alias("system_size")
@@ -34,36 +73,150 @@ def main():
         query_all_cycles.append(cycle_frame)
 
     # Save a combination of all queries
-    query_all_cycles = pl.concat(query_all_cycles).sort(by="planet_name")
+    query_all_cycles = pl.concat(query_all_cycles).sort(
+        by="planet_name", maintain_order=True
+    )
     save_parameters(query_all_cycles, "all")
 
     return
 
 
-def handle_single_file(filename: str) -> pl.DataFrame:
+async def handle_all_files(
+        filenames: list[str], version: tp.Union[str, None] = None,
+        max_concurrent: int = MAX_CONCURRENT_QUERIES
+        ) -> list[pl.DataFrame]:
+    """
+    Perform the standardised query for several input files at once.
+    At most 'max_concurrent' archive queries run at the same time, and
+    each cycle is finalised as soon as its result arrives.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def query_single_file(filename: str) -> tuple:
+        logging.info(f"Compiling results for {filename}")
+        cycle_frame, cycle_n = read_jwst_cycle(filename=filename)
+        query_names = unique_planet_names(cycle_frame)
+
+        # The (blocking) archive query runs in a worker thread
+        async with semaphore:
+            query_result = await asyncio.to_thread(
+                query_planet_names, query_names
+            )
+
+        return cycle_frame, cycle_n, query_result
+
+    pending = [
+        asyncio.create_task(query_single_file(filename))
+        for filename in filenames
+    ]
+
+    finalised_frames = {}
+    for finished in asyncio.as_completed(pending):
+        cycle_frame, cycle_n, query_result = await finished
+        finalised_frames[cycle_n] = finalise_cycle(
+            cycle_frame, cycle_n, query_result, version
+        )
+
+    # Return in cycle order, independent of the query completion order
+    return [finalised_frames[cycle_n] for cycle_n in sorted(finalised_frames)]
+
+
+def handle_single_file(
+        filename: str, version: tp.Union[str, None] = None
+        ) -> pl.DataFrame:
     """Perform standardised query for one input file"""
     logging.info(f"Compiling results for {filename}")
 
     cycle_frame, cycle_n = read_jwst_cycle(filename=filename)
 
-    # Make unique list of planet names to query
+    # Query EPA and update existing data frame
+    query_result = query_planet_names(unique_planet_names(cycle_frame))
+
+    return finalise_cycle(cycle_frame, cycle_n, query_result, version)
+
+
+def unique_planet_names(cycle_frame: pl.DataFrame) -> np.ndarray:
+    """Make unique list of planet names to query"""
     unique_names = cycle_frame.unique(
         subset=["planet_name"],
         maintain_order=True
     )
-    query_names = unique_names["planet_name"].to_numpy()
 
-    # Query EPA and update existing data frame
-    query_result = pl.from_pandas(epa.query_nasa_epa(query_names))
+    return unique_names["planet_name"].to_numpy()
+
+
+def query_planet_names(query_names: np.ndarray) -> pl.DataFrame:
+    """Query the EPA for a list of planet names"""
+    query_columns = None
+    if FULL_PARAMETERS is False:
+        query_columns = REDUCED_PARAMETERS + HZ_PARAMETERS
+
+    query_result = epa.query_nasa_epa(
+        query_names, refresh=REFRESH_QUERY, mode=QUERY_MODE,
+        output="polars", columns=query_columns, table=QUERY_TABLE
+    )
+
+    return query_result
+
+
+def finalise_cycle(
+        cycle_frame: pl.DataFrame, cycle_n: int,
+        query_result: pl.DataFrame, version: tp.Union[str, None] = None
+        ) -> pl.DataFrame:
+    """
+    Update a cycle frame with its query result and save it. The raw
+    query result is also stored as part of a snapshot version (a new
+    one if none is given), see target_query-diff.py. Derived columns
+    are left out, since the HZ probabilities are Monte Carlo estimates
+    that differ between runs.
+    """
+    if version is None:
+        version = qv.new_version()
+    qv.store_version(query_result, f"cycle-{cycle_n}", version)
+
+    query_result = add_habitable_zone(query_result)
     combined_frame = update_frame(cycle_frame, query_result)
 
     # Save full and reduced frame
-    logging.info("Saving results...\n")
+    logging.info(f"Saving results for cycle {cycle_n}...\n")
     save_parameters(combined_frame, cycle_n)
 
     return combined_frame
 
 
+def add_habitable_zone(query_result: pl.DataFrame) -> pl.DataFrame:
+    """
+    Classify the HZ zone of every queried planet, with Monte Carlo
+    probabilities for the conservative and optimistic HZ drawn from
+    the stellar uncertainties.
+    """
+    columns = {
+        name: query_result[name].cast(pl.Float64).to_numpy()
+        for name in [
+            "sma_au", "star-teff_kelvin", "star-teff_errpos",
+            "star-teff_errneg", "star-log10-lbol_lsol",
+            "star-log10-lbol_errpos", "star-log10-lbol_errneg"
+        ]
+    }
+
+    hz_zone = hz.classify_habitable_zone(
+        columns["sma_au"], columns["star-teff_kelvin"],
+        columns["star-log10-lbol_lsol"]
+    )
+    hz_probabilities = hz.habitable_zone_probabilities(
+        columns["sma_au"], columns["star-teff_kelvin"],
+        columns["star-teff_errpos"], columns["star-teff_errneg"],
+        columns["star-log10-lbol_lsol"], columns["star-log10-lbol_errpos"],
+        columns["star-log10-lbol_errneg"], n_samples=HZ_MC_SAMPLES
+    )
+
+    return query_result.with_columns([
+        pl.Series("hz_zone", hz_zone),
+        pl.Series("hz_conservative_prob", hz_probabilities["conservative"]),
+        pl.Series("hz_optimistic_prob", hz_probabilities["optimistic"]),
+    ])
+
+
 def read_jwst_cycle(filename: str) -> tuple[pl.DataFrame, int]:
     """Reading individual cycle files."""
     # ToDo: Not the best solution, very static
@@ -82,48 +235,61 @@ def update_frame(
         parent_frame: pl.DataFrame,
         child_frame: pl.DataFrame
         ) -> pl.DataFrame:
-    """Update existing data frame with queried parameters."""
+    """
+    Update existing data frame with queried parameters, through a left
+    join on the planet name. Also incorporates failed queries, which
+    are filled with NaN placeholders.
+    """
     # Add columns names unique to queried values
-    queried_columns = np.setdiff1d(
+    queried_columns = list(np.setdiff1d(
         child_frame.columns, parent_frame.columns
+    ))
+
+    # One query result per planet, marked to recognise failed queries
+    query_lookup = child_frame.unique(
+        subset=["planet_name"], keep="first", maintain_order=True
+    ).select(
+        ["planet_name"] + queried_columns
+    ).with_columns(
+        pl.lit(True).alias("queried")
     )
 
-    # Construct a finalised frame extending the initial parameters
-    final_frame = parent_frame.with_columns([
-        pl.lit(np.nan).alias(column_name)
-        for column_name in queried_columns
-    ])
+    # Extend the initial parameters by the query results
+    final_frame = parent_frame.join(
+        query_lookup, on="planet_name", how="left"
+    )
 
-    # Update the rows of finalised frame through iteration
-    temporary_dictionary = [
-        update_rows(element, child_frame)
-        for element in final_frame.iter_rows(named=True)
-    ]
+    # Failed queries (which are noted in the log-file) get placeholders
+    if final_frame["queried"].is_null().any():
+        final_frame = final_frame.with_columns([
+            failed_query_placeholder(column_name, dtype)
+            for column_name, dtype in final_frame.schema.items()
+            if column_name in queried_columns
+        ])
 
     # Sort the results by planet name
-    finalised = pl.DataFrame(temporary_dictionary).sort(by="planet_name")
+    finalised = final_frame.drop("queried").sort(
+        by="planet_name", maintain_order=True
+    )
 
     return finalised
 
 
-def update_rows(row_dict: dict, query_result: pl.DataFrame) -> dict:
+def failed_query_placeholder(column_name: str, dtype) -> pl.Expr:
     """
-    Update individual row of data frame, represented as dictionary.
-    Also incorporates failed queries
+    NaN placeholder for a queried column in rows of failed queries
+    (text columns receive the string "NaN", numbers become floats).
     """
-    try:
-        relevant_query = query_result.row(
-            by_predicate=(pl.col("planet_name") == row_dict["planet_name"]),
-            named=True
-        )
-        for key, value in relevant_query.items():
-            row_dict[key] = value
+    if dtype == pl.Utf8:
+        column = pl.col(column_name)
+        placeholder = pl.lit("NaN")
+    else:
+        column = pl.col(column_name).cast(pl.Float64)
+        placeholder = pl.lit(np.nan)
 
-    except pl.exceptions.NoRowsReturnedError:
-        # This skips over failed queries (which are noted in the log-file)
-        pass
-
-    return row_dict
+    return pl.when(
+        pl.col("queried").is_null()
+    ).then(placeholder).otherwise(column).alias(column_name)
 
 
 def save_parameters(
@@ -136,25 +302,8 @@ def save_parameters(
               f"jtp_full_cycle-{cycle_number}.csv")
     )
 
-    # Select necessary reduced parameters
-    intial_parameters = [
-        "planet_name", "jwst_instrument", "jwst_filter", "jwst_dispersion",
-        "type", "num_obs", "jwst_cycle", "pid", "eap_months"
-    ]
-    planet_parameters = [
-        "radius_rearth", "mass_mearth", "period_day", "sma_au",
-        "eq-temp_kelvin",
-    ]
-    star_parameters = [
-        "host_name", "system_size", "star-teff_kelvin",
-        "star-radius_rsol", "star-mass_msol", "star-log10-lbol_lsol",
-        "star-age_ga", "star-rotvel_kms"
-
-    ]
-    selection = intial_parameters + planet_parameters + star_parameters
-
     # Save a reduced frame
-    total_frame[selection].write_csv(
+    total_frame[REDUCED_PARAMETERS].write_csv(
         file=f"{OUTPUT}/jtp_cycle-{cycle_number}.csv"
     )
 
@@ -0,0 +1,149 @@
+import modules.kempton_metrics as km
+import matplotlib.pyplot as plt
+import target_schedule as ts
+import modules.util as u
+import logging as log
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+
+# GLOBALS
+OUTPUT = "output/target_release"
+PARTIALS = f"{OUTPUT}/partials"
+MANIFEST = f"{PARTIALS}/manifest.json"
+GROUP_COLUMNS = ["release_month", "instrument", "radius_class"]
+GEN_PLOTS = True
+
+
+def main():
+    # Set up logging solution
+    os.makedirs(PARTIALS, exist_ok=True)
+    log.basicConfig(
+        filename=f"{OUTPUT}/target_release.log",
+        filemode="w",
+        format="%(name)s - %(levelname)s - %(message)s",
+        level=log.INFO
+    )
+
+    # Per-cycle partial tables (only changed cycle files are processed)
+    partial_tables = update_partials(ts.CYCLE_FILES)
+    release_report = combine_partials(partial_tables)
+
+    # Compact tables: full grouping, and monthly totals per instrument
+    release_report.to_csv(f"{OUTPUT}/release_forecast.csv", index=False)
+    monthly = release_report.pivot_table(
+        index="release_month", columns="instrument",
+        values="n_obs", aggfunc="sum", fill_value=0
+    )
+    monthly.to_csv(f"{OUTPUT}/release_forecast_monthly.csv")
+
+    if GEN_PLOTS is True:
+        plot_release_timeline(monthly, "release_forecast")
+
+
+def file_hash(file_name: str) -> str:
+    """Content hash of an input file"""
+    with open(file_name, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def update_partials(cycle_files: dict) -> list[pd.DataFrame]:
+    """
+    Return the grouped partial table of every cycle file. Partials are
+    stored on disk and only recomputed if the content hash of their
+    cycle file changed since the last run.
+    """
+    manifest = {}
+    if os.path.isfile(MANIFEST):
+        with open(MANIFEST, "r") as file:
+            manifest = json.load(file)
+
+    partial_tables = []
+    for cycle, file_name in cycle_files.items():
+        content_hash = file_hash(file_name)
+        partial_file = f"{PARTIALS}/cycle{cycle}.parquet"
+
+        if manifest.get(file_name) == content_hash \
+                and os.path.isfile(partial_file):
+            log.info(f"Re-using release partial of {file_name}")
+            partial_tables.append(pd.read_parquet(partial_file))
+            continue
+
+        log.info(f"Computing release partial of {file_name}")
+        partial = release_partial(file_name, cycle)
+        partial.to_parquet(partial_file, index=False)
+        manifest[file_name] = content_hash
+        partial_tables.append(partial)
+
+    with open(MANIFEST, "w") as file:
+        json.dump(manifest, file, indent=1)
+
+    return partial_tables
+
+
+def release_partial(file_name: str, cycle: int) -> pd.DataFrame:
+    """
+    Observations of one cycle file, grouped by release month,
+    instrument, radius class and target (in one columnar pass).
+    """
+    observations = ts.explode_df_obs_date(
+        pd.read_csv(file_name), ts.DATE_COLUMN, ";"
+    )
+
+    release_frame = pd.DataFrame({
+        "release_month": observations[ts.DATE_COLUMN].dt.to_period(
+            "M"
+        ).astype(str),
+        "instrument": ts.instrument_family(observations["Instrument"]),
+        "radius_class": km.kempton_radius_class(observations["Radius [RE]"]),
+        "target": observations["Target Name"],
+        "cycle": cycle,
+    })
+
+    return release_frame.groupby(
+        GROUP_COLUMNS + ["target", "cycle"], as_index=False
+    ).size().rename(columns={"size": "n_obs"})
+
+
+def combine_partials(partial_tables: list[pd.DataFrame]) -> pd.DataFrame:
+    """Release forecast over all cycles from the partial tables"""
+    combined = pd.concat(partial_tables, ignore_index=True)
+
+    return combined.groupby(GROUP_COLUMNS, as_index=False).agg(
+        n_obs=("n_obs", "sum"), n_targets=("target", "nunique"),
+        cycles=("cycle", lambda cycles: ",".join(
+            str(entry) for entry in np.unique(cycles)
+        )),
+    ).sort_values(GROUP_COLUMNS, ignore_index=True)
+
+
+def plot_release_timeline(monthly: pd.DataFrame, savename: str) -> None:
+    """Stacked monthly data releases, coloured by instrument"""
+    fig, ax = plt.subplots(figsize=(11.69, 5))
+
+    months = pd.PeriodIndex(monthly.index, freq="M").to_timestamp()
+    bottom = np.zeros(monthly.shape[0])
+
+    for instrument in monthly.columns:
+        ax.bar(
+            months, monthly[instrument], bottom=bottom, width=25,
+            color=ts.INSTRUMENT_COLOUR_MAP.get(instrument, "tab:grey"),
+            edgecolor="black", lw=0.5, label=instrument
+        )
+        bottom += monthly[instrument].to_numpy()
+
+    ax.set(xlabel="Release month (end of EAP)",
+           ylabel="Number of observations")
+    ax.legend(ncols=monthly.shape[1], loc="upper left")
+
+    plt.tight_layout()
+    plt.savefig(f"{OUTPUT}/{savename}.svg")
+
+    return None
+
+
+if __name__ == "__main__":
+    u.rc_setup()
+    main()
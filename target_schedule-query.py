@@ -0,0 +1,72 @@
+import modules.schedule_index as si
+import target_schedule as ts
+import pandas as pd
+import argparse
+
+# GLOBALS
+PRINT_COLUMNS = [
+    "Target Name", "Instrument", "Proposal ID", "ObsCycle", "EAP [mon]",
+    si.OBSERVED_COLUMN, si.RELEASE_COLUMN
+]
+
+
+def main():
+    arguments = parse_arguments()
+
+    # Index over the observations of all cycles
+    schedule_index = si.build_schedule_index(ts.read_all_cycles())
+
+    if arguments.query == "observed":
+        result = si.observed_between(
+            schedule_index, arguments.start, arguments.end
+        )[PRINT_COLUMNS]
+
+    elif arguments.query == "released":
+        result = si.released_between(
+            schedule_index, arguments.start, arguments.end
+        )[PRINT_COLUMNS]
+
+    elif arguments.query == "programs":
+        result = si.programs_active(
+            schedule_index, arguments.start, arguments.end
+        )
+
+    elif arguments.query == "repeats":
+        result = si.repeated_visits(schedule_index, arguments.days)
+
+    else:
+        result = si.overlapping_programs(schedule_index)
+
+    with pd.option_context("display.max_rows", None,
+                           "display.width", None):
+        print(f"\n{result}\n\n{result.shape[0]} entries")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Command line interface for schedule queries over all cycles"""
+    parser = argparse.ArgumentParser(
+        description="Query JWST observation and data release dates"
+    )
+    queries = parser.add_subparsers(dest="query", required=True)
+
+    for name, help_text in [
+        ("observed", "observations between two dates"),
+        ("released", "data releases (end of EAP) between two dates"),
+        ("programs", "programs observing between two dates"),
+    ]:
+        window = queries.add_parser(name, help=help_text)
+        window.add_argument("start", help="YYYY-MM-DD")
+        window.add_argument("end", help="YYYY-MM-DD")
+
+    repeats = queries.add_parser(
+        "repeats", help="repeated visits of a target within N days"
+    )
+    repeats.add_argument("days", type=float)
+
+    queries.add_parser("overlaps", help="programs with overlapping windows")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,20 @@
-import dateutil.relativedelta as daterel
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 import modules.util as u
-from typing import Tuple
+from typing import Tuple, Union
 import datetime as dt
 import pandas as pd
 import numpy as np
-import copy as cp
+import logging as log
 
 
 # GLOBALS
 INPUT_FILE = "data/JWST_cycle1_targets.csv"
+CYCLE_FILES = {
+    1: "data/JWST_cycle1_targets.csv", 2: "data/JWST_cycle2_targets.csv"
+}
+DATE_COLUMN = "Observation Date(s) [MM/DD/YY]"
 INSTRUMENT_COLOUR_MAP = {
     "NIRSpec": "tab:blue", "MIRI": "tab:red",
     "NIRISS": "tab:orange", "NIRCam": "tab:green"
@@ -20,10 +23,18 @@ INSTRUMENT_COLOUR_MAP = {
 
 def main():
     """Main call"""
+    # Set up logging solution
+    log.basicConfig(
+        filename="output/target_schedule/target_schedule.log",
+        filemode="w",
+        format="%(name)s - %(levelname)s - %(message)s",
+        level=log.INFO
+    )
+
     # Read the input file, and explode the observation date column
     # (also convert to datetime objects)
     target_list_all = explode_df_obs_date(
-        pd.read_csv(INPUT_FILE), "Observation Date(s) [MM/DD/YY]", ";"
+        pd.read_csv(INPUT_FILE), DATE_COLUMN, ";"
     )
 
     # Define individual desired plots
@@ -37,22 +48,22 @@ def main():
 
 def wrap_schedule_plot(select_list: pd.DataFrame, savename: str) -> None:
     """Wrapper for plotting of selected target schedule"""
-    final_length = select_list.shape[0]
-
     # Plotting routine
     fig, ax = timeline_plot_setup()
 
-    # Make sure points are plotted in observation date order
-    for name in select_list["Target Name"].unique():
-
-        temp_frame = select_list.loc[select_list["Target Name"] == name]
-        temp_frame = temp_frame.sort_values(
-            by="Observation Date(s) [MM/DD/YY]", ascending=False
+    # One collection per instrument colour and filter marker
+    plot_frame, row_labels = schedule_plot_frame(select_list)
+    for (colour, marker), group in plot_frame.groupby(
+            ["colour", "marker"], sort=False
+    ):
+        ax.scatter(
+            group[DATE_COLUMN], group["row"], s=30, marker=marker, lw=0.5,
+            c=colour, edgecolor="black", zorder=4
         )
 
-        total_obs = temp_frame.shape[0]
-        for idx in range(total_obs):
-            indiv_target_plot(temp_frame.iloc[idx], ax, total_obs)
+    # Target names (and number of observations) as row labels
+    ax.set_yticks(np.arange(len(row_labels)), labels=row_labels)
+    ax.yaxis.set_minor_locator(mpl.ticker.NullLocator())
 
     # Plot indication of current date
     today = dt.datetime.today()
@@ -66,57 +77,116 @@ def wrap_schedule_plot(select_list: pd.DataFrame, savename: str) -> None:
     return
 
 
+def schedule_plot_frame(
+        select_list: pd.DataFrame
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Integer row position, colour and marker of every observation, and
+    the row labels "<name> (<number of observations>)". Rows follow the
+    order in which targets first appear in the list.
+    """
+    names = select_list["Target Name"]
+    row_position, unique_names = pd.factorize(names)
+    obs_count = names.value_counts().reindex(unique_names).to_numpy()
+
+    colour, marker = assign_inst_styles(select_list)
+    plot_frame = select_list.assign(
+        row=row_position, colour=colour, marker=marker
+    )
+
+    row_labels = np.array([
+        f"{name} ({count})" for name, count in zip(unique_names, obs_count)
+    ])
+
+    return plot_frame, row_labels
+
+
 def explode_df_obs_date(
         raw_data_frame: pd.DataFrame,
         explode_column: str,
-        date_delimiter: str
+        date_delimiter: str,
+        observed_column: Union[str, None] = None
 ) -> pd.DataFrame:
-    """Prepare data frame by exploding observation date lists"""
+    """
+    Prepare data frame by exploding observation date lists. The dates
+    in 'explode_column' are shifted by the EAP period (release dates);
+    the unshifted dates are kept in 'observed_column' if given.
+    """
     # Make sure that the date entries in the data frame are lists by
-    # using string-split method with a pre-defined delimiter
-    raw_data_frame[explode_column] = \
-        raw_data_frame[explode_column].str.split(date_delimiter)
-
-    # Generate a new data frame by exploding the observation date lists
-    new_frame = raw_data_frame.explode(explode_column, ignore_index=True)
-
-    # Generate individual Series (assuming exploding column is date!)
-    dates = np.array(
-        [entry.strip() for entry in new_frame[explode_column].values]
-    )
-    new_frame[explode_column] = dates
+    # using string-split method with a pre-defined delimiter, and
+    # generate a new data frame by exploding the observation date lists
+    # (as text, since columns without any date are read as floats)
+    new_frame = raw_data_frame.assign(**{
+        explode_column: raw_data_frame[explode_column].astype(
+            "string"
+        ).str.split(date_delimiter)
+    }).explode(explode_column, ignore_index=True)
+    dates = new_frame[explode_column].str.strip()
 
     # Some observations are marked as "Long Range", meaning they are
-    # being extended into Cycle 2 due to scheduling
-    longrange = new_frame.loc[new_frame[explode_column] == "Long Range"]
-    print("\n\n The following entries have been marked as 'Long Range'\n"
-          f"{longrange}\n")
+    # being extended into Cycle 2 due to scheduling (observations
+    # without any date cannot be scheduled either)
+    longrange = (dates == "Long Range") | dates.isna()
+    if longrange.any():
+        log.info(
+            f"The following {np.count_nonzero(longrange)} entries have "
+            f"been marked as 'Long Range' or have no date:\n"
+            f"{new_frame.loc[longrange, ['Target Name', 'Proposal ID']]}"
+        )
 
     # Remove these from the data frame
-    cleaned_frame = cp.deepcopy(
-        new_frame.loc[new_frame[explode_column] != "Long Range"]
-    )
-    clean_dates = cleaned_frame[explode_column]
+    cleaned_frame = new_frame.loc[~longrange].copy()
 
     # Read in datetime-versions of planned observation dates
-    dates_nf = np.array([
-        dt.datetime.strptime(d.strip(), '%m/%d/%y').date()
-        for d in clean_dates
-    ])
+    observed = pd.to_datetime(dates[~longrange], format="%m/%d/%y")
 
-    # Correct with the EAP period
-    eap_dur = cleaned_frame["EAP [mon]"].values
-    dates_finalised = np.array([
-        dates_nf[idx] + daterel.relativedelta(months=+eap_dur[idx])
-        for idx in range(len(dates_nf))
-    ])
+    if observed_column is not None:
+        cleaned_frame[observed_column] = observed
 
-    # Replace entries for observation date in new frame
-    cleaned_frame[explode_column] = dates_finalised
+    # Correct with the EAP period (calendar months, with the day
+    # clipped to the end of shorter months)
+    cleaned_frame[explode_column] = add_months(
+        observed, cleaned_frame["EAP [mon]"].to_numpy()
+    )
 
     return cleaned_frame
 
 
+def add_months(dates: pd.Series, months: np.ndarray) -> pd.Series:
+    """
+    Add a number of calendar months to each date (like relativedelta,
+    the day is clipped to the length of the target month).
+    """
+    month_index = (dates.dt.year * 12 + dates.dt.month - 1
+                   + months.astype(np.int64))
+
+    month_start = pd.to_datetime(pd.DataFrame({
+        "year": month_index // 12, "month": month_index % 12 + 1, "day": 1
+    }, index=dates.index))
+    day = np.minimum(dates.dt.day, month_start.dt.days_in_month)
+
+    return month_start + pd.to_timedelta(day - 1, unit="D")
+
+
+def read_all_cycles(
+        cycle_files: dict = CYCLE_FILES,
+        observed_column: Union[str, None] = "Observed Date"
+) -> pd.DataFrame:
+    """
+    Exploded observations of all cycle files, with a cycle indicator,
+    release dates in DATE_COLUMN and observation dates in
+    'observed_column'.
+    """
+    cycle_frames = [
+        explode_df_obs_date(
+            pd.read_csv(file_name), DATE_COLUMN, ";", observed_column
+        ).assign(ObsCycle=cycle)
+        for cycle, file_name in cycle_files.items()
+    ]
+
+    return pd.concat(cycle_frames, ignore_index=True)
+
+
 def select_targets(
         target_df: pd.DataFrame,
         eap_constraint=None,
@@ -162,32 +232,31 @@ def select_targets(
     return target_df
 
 
-def assign_inst_colour(
-        raw_data_frame: pd.Series,
-        inst_key: str
-) -> tuple:
-    """Assign colour for plot based on instrument used"""
-    # Instrument colour scheme
-    inst_col = INSTRUMENT_COLOUR_MAP
+def instrument_family(instrument: pd.Series) -> pd.Series:
+    """Instrument name from entries like "NIRSpec / BOTS" """
+    return instrument.str.split(" / ").str[0]
+
 
-    # Target instrument key values
-    inst_id_lst = raw_data_frame[inst_key].split(" / ")
+def assign_inst_styles(target_df: pd.DataFrame) -> Tuple[np.ndarray, ...]:
+    """Assign plot colours and markers based on instrument and filter"""
+    family = instrument_family(target_df["Instrument"])
 
     # Assign colours based on instrument (entries are e.g. "NIRspec, BOTS")
-    colour_key = inst_col[inst_id_lst[0]]
+    colour = family.map(INSTRUMENT_COLOUR_MAP)
+    if colour.isna().any():
+        log.warning(f"No colour for instrument(s) "
+                    f"{family[colour.isna()].unique()}")
+    colour = colour.fillna("tab:grey").to_numpy()
 
     # Assign marker based on filter (wavelength-range)
     # TODO: Cover all instrument-filer-combinations
-    marker_filter = "o"
-    inst_filter = raw_data_frame["Filter"]
-
-    if inst_id_lst[0] == "NIRSpec":
-        if inst_filter == "F290LP":
-            marker_filter = "X"
-        else:
-            marker_filter = "P"
+    marker = np.where(
+        family == "NIRSpec",
+        np.where(target_df["Filter"] == "F290LP", "X", "P"),
+        "o"
+    )
 
-    return colour_key, marker_filter
+    return colour, marker
 
 
 def timeline_plot_setup() -> Tuple[plt.Figure, plt.Axes]:
@@ -202,22 +271,6 @@ def timeline_plot_setup() -> Tuple[plt.Figure, plt.Axes]:
     return fig, ax
 
 
-def indiv_target_plot(
-        df_entry: pd.Series, ax: plt.Axes, label_add: int
-) -> None:
-    """Plot individual target entry in extended data frame"""
-    # Plot parameters
-    date = df_entry["Observation Date(s) [MM/DD/YY]"]
-    name = df_entry["Target Name"]
-    colour_inst, marker_filt = assign_inst_colour(df_entry, "Instrument")
-
-    # Plot values and
-    ax.scatter(
-        date, f"{name} ({label_add})", s=30, marker=marker_filt, lw=0.5,
-        c=colour_inst, edgecolor="black", zorder=4
-    )
-
-
 def timeline_plot_cleanup(ax: plt.Axes) -> None:
     """General plot cleanup"""
     # Create and place custom legend
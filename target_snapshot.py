@@ -0,0 +1,64 @@
+import modules.epa_snapshot as snapshot
+import modules.epa_query as eq
+import logging as log
+import argparse
+import time
+
+
+def main():
+    log.basicConfig(
+        format="%(name)s - %(levelname)s - %(message)s", level=log.INFO
+    )
+    arguments = parse_arguments()
+
+    if arguments.command == "refresh":
+        snapshot_info = snapshot.refresh_snapshot(
+            eq.search_tap, arguments.tables or None
+        )
+
+    elif arguments.command == "query":
+        start = time.perf_counter()
+        result_table = snapshot.run_local_query(arguments.adql)
+        print(f"\n{result_table.to_pandas()}\n\n{result_table.num_rows} "
+              f"rows in {time.perf_counter() - start:.3f} s")
+        return
+
+    else:
+        snapshot_info = snapshot.read_snapshot_info()
+
+    for table_name, entry in snapshot_info.items():
+        created = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(entry["created"])
+        )
+        print(f"{table_name}: {entry['rows']} rows, "
+              f"{entry['size'] / 1024 ** 2:.1f} MB, created {created}")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Command line interface for the local EPA snapshot"""
+    parser = argparse.ArgumentParser(
+        description="Local snapshot of the NASA Exoplanet Archive tables"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    refresh = commands.add_parser(
+        "refresh", help="download the snapshot from the archive"
+    )
+    refresh.add_argument(
+        "tables", nargs="*",
+        help=f"tables to refresh, any of {list(snapshot.SNAPSHOT_TABLES)} "
+             f"(default: all)"
+    )
+
+    query = commands.add_parser(
+        "query", help="run an ADQL query against the snapshot"
+    )
+    query.add_argument("adql")
+
+    commands.add_parser("info", help="show the snapshot tables")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
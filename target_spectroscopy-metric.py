@@ -1,14 +1,24 @@
-import modules.kempton_metrics as km
+import modules.derived_metrics as dm
+import modules.metric_uncertainty as mu
+import modules.query_filters as qf
+import modules.planck_table as pt
 import modules.simbad_query as sq
+import modules.epa_query as eq
 import matplotlib.pyplot as plt
 import modules.util as u
 import pandas as pd
 import numpy as np
 import logging
-import pyvo
 
 # TODO: Include ESM calculation
 GEN_PLOTS = False
+REFRESH_QUERY = False
+OFFLINE_QUERY = False       # Use the local EPA snapshot
+REFRESH_SIMBAD = False      # Resolve all names again (alias cache)
+MC_SAMPLES = 0              # Samples per planet for TSM/ESM percentiles
+MC_SINGLE_PRECISION = False
+ESM_BANDS = False           # ESM at the centres of the JWST cycle bands
+JWST_CYCLE_FILES = ["JWST_cycle1_targets.csv", "JWST_cycle2_targets.csv"]
 INDIV_SYSTEM = "HD 260655"
 
 
@@ -18,6 +28,7 @@ def main():
     logging.basicConfig(filename=simbad_log, level=logging.INFO)
     # This captures astropy warnings
     logging.captureWarnings(True)
+    eq.OFFLINE = OFFLINE_QUERY
     print(
         f"\nBe aware that SIMBAR query errors are logged into "
         f"{simbad_log} rather than displayed"
@@ -31,7 +42,7 @@ def main():
     query_res = create_tsm_table(query_file)
 
     # Make a quick probe if targets are in JWST or ARIEL lists
-    sq.target_comparison(query_res)
+    sq.target_comparison(query_res, refresh=REFRESH_SIMBAD)
 
     # Save the full results, as well as the best 20 (maybe?)
     query_res.to_csv(
@@ -73,16 +84,32 @@ def create_tsm_table(query_file: str) -> pd.DataFrame:
     with open(query_file, "r") as query_file:
         adql_query = query_file.read().replace('\n', ' ')
 
+    # Only request rows with all inputs of the TSM and ESM
+    adql_query = qf.add_where(
+        adql_query, dm.metric_filters(["TSM", "ESM"])
+    )
+
     # Execute query and add TSM value
-    # TODO: Insert adjustment here!
-    query_res = query_nasa_epa(adql_query)
-    km.kempton_metrics(query_res)
+    query_res = query_nasa_epa(adql_query, refresh=REFRESH_QUERY)
+    query_res = dm.derive_metrics(query_res, ["pl_eqt", "TSM", "ESM"])
 
     # Restrict to only existing TSM and ESM values
     query_res = query_res.dropna(subset=["TSM", "ESM"])
 
     # Add some additional values
-    km.transit_estimations(query_res)
+    query_res = dm.derive_metrics(
+        query_res, ["td_perc", "sig_prim_ppm", "sig_seco_ppm"]
+    )
+
+    # Optional percentiles of TSM and ESM from mass and radius errors
+    if MC_SAMPLES > 0:
+        query_res = query_res.join(mu.monte_carlo_metrics(
+            query_res, MC_SAMPLES, single_precision=MC_SINGLE_PRECISION
+        ))
+
+    # Optional ESM in each band observed in the JWST cycles
+    if ESM_BANDS is True:
+        query_res = query_res.join(band_esm(query_res))
 
     # Restrict results to only non-NaN values for TSM, and sort
     # by descending TSM-value
@@ -93,6 +120,29 @@ def create_tsm_table(query_file: str) -> pd.DataFrame:
     return query_res
 
 
+def band_esm(query_res: pd.DataFrame) -> pd.DataFrame:
+    """
+    ESM at the central wavelength of every band in the JWST cycle
+    files (e.g. "ESM_9.5um"), with the Planck lookup table
+    """
+    band_ranges = pd.Series(np.concatenate([
+        sq.read_targets(file_name, "λ [μm]")
+        for file_name in JWST_CYCLE_FILES
+    ]))
+    wavelengths = pt.unique_bands(band_ranges)
+
+    esm_values = pt.esm_wavelengths(
+        *[query_res[column_name].to_numpy(dtype=float) for column_name
+          in ["pl_eqt", "st_teff", "pl_rade", "st_rad", "sy_kmag"]],
+        wavelengths=wavelengths
+    )
+
+    return pd.DataFrame(
+        esm_values, index=query_res.index,
+        columns=[f"ESM_{centre * 1e6:.3g}um" for centre in wavelengths]
+    )
+
+
 def plot_tsm_table(tsm_table: pd.DataFrame, save_id: str) -> None:
     """Plot TSM values in reference to some specified parameter"""
     # 1st figure: System distance against TSM, radius colour-map
@@ -237,20 +287,15 @@ def calc_density_plot_pars(subframe: pd.DataFrame) -> tuple:
     return number_of_planet, x_limits, y_limits
 
 
-def query_nasa_epa(query_string: str) -> pd.DataFrame:
+def query_nasa_epa(
+        query_string: str, refresh: bool = False
+) -> pd.DataFrame:
     """
     Query the NASA Exoplanet Archive using TAP through pyVO. The
     values returned here are the ones flagged as "default" in the EPA
-    catalogue.
+    catalogue. Identical queries are served from the local cache.
     """
-    # Set up NASA EPA query with pyVO
-    tap_source = "https://exoplanetarchive.ipac.caltech.edu/TAP"
-    service = pyvo.dal.TAPService(tap_source)
-
-    # Use pyVO to query NASA EPA
-    result_table = service.search(query_string)
-
-    return result_table.to_table().to_pandas()
+    return eq.run_tap_query(query_string, refresh=refresh)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+import sys
+import os
+
+# Tests import the flat modules and scripts from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -0,0 +1,98 @@
+import pytest
+
+for dependency in ["pyarrow"]:
+    pytest.importorskip(dependency)
+
+import modules.epa_cache as cache
+import pyarrow as pa
+import time
+
+
+def result_table(value: float) -> pa.Table:
+    return pa.table({"pl_name": ["GJ 1214 b"], "pl_rade": [value]})
+
+
+class CountingQuery:
+    """Query function stand-in counting its calls"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, adql_query: str) -> pa.Table:
+        self.calls += 1
+        return result_table(float(self.calls))
+
+
+def test_normalise_adql():
+    """Whitespace and semicolons are normalised, literals are not"""
+    assert cache.normalise_adql(
+        "SELECT pl_name\n   FROM   pscomppars\tWHERE pl_name = 'a  b' ;\n"
+    ) == "SELECT pl_name FROM pscomppars WHERE pl_name = 'a  b'"
+
+    assert cache.cache_key("SELECT a FROM ps;") \
+        == cache.cache_key("  SELECT a\nFROM ps")
+    assert cache.cache_key("SELECT a FROM ps WHERE b = 'x y'") \
+        != cache.cache_key("SELECT a FROM ps WHERE b = 'x  y'")
+    assert cache.cache_key("SELECT a FROM ps WHERE b = 'it''s  x'") \
+        != cache.cache_key("SELECT a FROM ps WHERE b = 'it''s x'")
+    assert cache.cache_key("SELECT a FROM ps", "upload") \
+        != cache.cache_key("SELECT a FROM ps")
+
+
+def test_cached_query_and_refresh(tmp_path):
+    query = CountingQuery()
+    cache_dir = str(tmp_path)
+
+    first = cache.cached_query("SELECT a FROM ps", query, cache_dir=cache_dir)
+    second = cache.cached_query(
+        "SELECT a\n FROM ps;", query, cache_dir=cache_dir
+    )
+    assert query.calls == 1
+    assert second.equals(first)
+
+    # A refresh skips the lookup, but updates the cache
+    refreshed = cache.cached_query(
+        "SELECT a FROM ps", query, refresh=True, cache_dir=cache_dir
+    )
+    assert query.calls == 2
+    assert refreshed["pl_rade"].to_pylist() == [2.]
+    assert cache.cached_query(
+        "SELECT a FROM ps", query, cache_dir=cache_dir
+    ).equals(refreshed)
+
+
+def test_ttl_expiry(tmp_path):
+    query = CountingQuery()
+    cache_dir = str(tmp_path)
+
+    cache.cached_query("SELECT a FROM ps", query, cache_dir=cache_dir)
+    cache.cached_query(
+        "SELECT a FROM ps", query, ttl=-1, cache_dir=cache_dir
+    )
+    assert query.calls == 2
+
+    key = cache.cache_key("SELECT a FROM ps")
+    assert cache.load_cached(key, ttl=-1, cache_dir=cache_dir) is None
+    assert cache.load_cached(key, cache_dir=cache_dir) is not None
+
+
+def test_lru_eviction_keeps_new_entry(tmp_path):
+    cache_dir = str(tmp_path)
+    keys = [cache.cache_key(f"SELECT {name} FROM ps") for name in "abc"]
+
+    for key, name in zip(keys, "abc"):
+        cache.store_cached(key, f"SELECT {name} FROM ps",
+                           result_table(1.), cache_dir=cache_dir)
+        time.sleep(0.01)
+
+    # Using the first entry makes the second the least recently used
+    cache.load_cached(keys[0], cache_dir=cache_dir)
+    size = cache.read_index(cache_dir)[keys[0]]["size"]
+
+    cache.evict_cache(2 * size, cache_dir, keep=keys[1])
+    assert set(cache.read_index(cache_dir)) == {keys[0], keys[1]}
+
+    # The kept entry survives even if it alone exceeds the limit
+    cache.evict_cache(0, cache_dir, keep=keys[1])
+    assert set(cache.read_index(cache_dir)) == {keys[1]}
+    assert (tmp_path / f"{keys[1]}.parquet").is_file()
+    assert not (tmp_path / f"{keys[0]}.parquet").is_file()
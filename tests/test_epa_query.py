@@ -0,0 +1,233 @@
+import pytest
+
+for dependency in ["numpy", "pandas", "polars", "pyarrow", "astropy", "pyvo"]:
+    pytest.importorskip(dependency)
+
+import modules.epa_query as eq
+from astropy.table import Table
+import numpy as np
+import os
+
+
+def test_query_in_chunks_without_targets(monkeypatch):
+    """No names: no query is sent, the result has the catalogue columns"""
+    def no_query(*args, **kwargs):
+        raise AssertionError("NO QUERY EXPECTED!")
+
+    monkeypatch.setattr(eq, "run_tap_query_arrow", no_query)
+    catalogue = eq.create_query_parameter_catalogue(eq.QUERY_PARAMETERS)
+
+    result = eq.query_in_chunks(np.array([], dtype=str), catalogue)
+
+    assert result.num_rows == 0
+    assert result.column_names == list(catalogue)
+
+
+# Local TAP stand-in: pscomppars rows of the test snapshot
+STANDIN_ROWS = {
+    "pl_name": ["GJ 1214 b", "TOI-270 c", "55 Cnc e"],
+    "pl_rade": [2.742, 2.355, 1.875],
+    "pl_radeerr1": [0.05, 0.06, 0.03],
+    "pl_radeerr2": [-0.05, -0.06, -0.03],
+    "hostname": ["GJ 1214", "TOI-270", "55 Cnc"],
+}
+
+
+@pytest.fixture
+def tap_standin(tmp_path, monkeypatch):
+    """
+    Minimal synchronous TAP service: uploaded tables are read from the
+    multipart request and the query runs through the DuckDB executor
+    against a small pscomppars snapshot. Returns the list of received
+    queries.
+    """
+    pytest.importorskip("duckdb")
+    import modules.epa_snapshot as snapshot
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from astropy.io.votable import from_table, parse_single_table
+    from email.parser import BytesParser
+    from email.policy import HTTP
+    import pyarrow.parquet as pq
+    import pyarrow as pa
+    import threading
+    import io
+
+    snapshot_dir = str(tmp_path / "snapshot")
+    os.makedirs(snapshot_dir)
+    # Catalogue columns without test values are empty
+    catalogue = eq.create_query_parameter_catalogue(eq.QUERY_PARAMETERS)
+    rows = {
+        name: STANDIN_ROWS.get(name, [None] * 3) for name in catalogue
+    }
+    pq.write_table(
+        pa.table(rows), snapshot.snapshot_file(
+            "pscomppars", snapshot_dir
+        )
+    )
+    received = []
+
+    class TapHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n"
+                .encode() + body
+            )
+
+            fields, uploads = {}, {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                payload = part.get_payload(decode=True)
+                if part.get_filename() is None:
+                    fields[name.upper()] = payload.decode()
+                else:
+                    uploads[name] = parse_single_table(
+                        io.BytesIO(payload)
+                    ).to_table().to_pandas()
+
+            received.append((fields["QUERY"], uploads))
+            result = snapshot.run_local_query(
+                fields["QUERY"], uploads, snapshot_dir
+            )
+
+            output = io.BytesIO()
+            from_table(Table.from_pandas(result.to_pandas())).to_xml(output)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.end_headers()
+            self.wfile.write(output.getvalue())
+
+        def log_message(self, *args):
+            return None
+
+    server = HTTPServer(("127.0.0.1", 0), TapHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setattr(
+        eq, "TAP_SOURCE", f"http://127.0.0.1:{server.server_port}"
+    )
+    monkeypatch.chdir(tmp_path)     # Query cache of this test only
+    yield received
+
+    server.shutdown()
+
+
+def test_upload_query_against_standin(tap_standin):
+    """Upload mode joins the uploaded names server-side"""
+    names = np.array(["GJ 1214 b", "55 Cnc e", "Unknown b"])
+    result = eq.query_nasa_epa(
+        names, mode="upload", output="pandas",
+        columns=["planet_name", "radius_rearth", "host_name"]
+    )
+
+    query, uploads = tap_standin[0]
+    assert "JOIN TAP_UPLOAD.targets AS t" in query
+    assert "SELECT p.pl_name,p.hostname,p.pl_rade FROM" in query
+    assert list(uploads["targets"]["target_name"]) == list(names)
+
+    result = result.sort_values("planet_name", ignore_index=True)
+    assert list(result["planet_name"]) == ["55 Cnc e", "GJ 1214 b"]
+    assert list(result["radius_rearth"]) == [1.875, 2.742]
+    assert list(result["host_name"]) == ["55 Cnc", "GJ 1214"]
+
+
+def test_upload_cache_key(tap_standin):
+    """Identical uploads are cached, different uploads are not"""
+    for names in [["GJ 1214 b"], ["GJ 1214 b"], ["TOI-270 c"]]:
+        result = eq.query_nasa_epa(
+            np.array(names), mode="upload", output="arrow"
+        )
+        assert result["planet_name"].to_pylist() == names
+
+    assert len(tap_standin) == 2
+
+
+def ps_solutions():
+    """Three solutions of one planet and one of another"""
+    import pyarrow as pa
+
+    return pa.table({
+        "pl_name": ["GJ 1214 b"] * 3 + ["TOI-270 c"],
+        "pl_rade": [2.85, 2.742, 2.733, 2.355],
+        "pl_radeerr1": [0.2, 0.05, 0.03, 0.07],
+        "pl_radeerr2": [-0.2, -0.05, -0.03, -0.07],
+        "pl_bmasse": [6.5, 8.17, None, None],
+        "pl_pubdate": ["2013-01", "2021-07", "2024-05", "2023-02"],
+        "default_flag": [0, 1, 0, 1],
+    })
+
+
+def test_select_solutions():
+    """Mass first, then most recent; rule columns are dropped"""
+    catalogue = {"pl_name": "planet_name", "pl_rade": "radius_rearth"}
+
+    selected = eq.select_solutions(ps_solutions(), catalogue)
+    assert selected.column_names == ["pl_name", "pl_rade"]
+    assert selected["pl_rade"].to_pylist() == [2.742, 2.355]
+
+    selected = eq.select_solutions(
+        ps_solutions(), catalogue, ["radius_error"]
+    )
+    assert selected["pl_rade"].to_pylist() == [2.733, 2.355]
+
+
+def test_full_catalogue_ps_query():
+    """References of 'ps' come from its solution reference columns"""
+    catalogue = eq.create_query_parameter_catalogue(eq.QUERY_PARAMETERS)
+    assert "pl_rade_reflink" in catalogue
+
+    ps_queries = [
+        eq.construct_adql_query(["GJ 1214 b"], catalogue, "ps"),
+        eq.construct_upload_query(catalogue, "ps"),
+    ]
+    for adql_query in ps_queries:
+        assert "_reflink" not in adql_query
+        for column_name in ["pl_refname", "st_refname", "pl_pubdate"]:
+            assert column_name in adql_query
+
+    # pscomppars keeps one reference per parameter
+    adql_query = eq.construct_adql_query(["GJ 1214 b"], catalogue)
+    assert "pl_rade_reflink" in adql_query
+    assert "pl_refname" not in adql_query
+
+    solutions = ps_solutions().append_column(
+        "pl_refname", [["A", "B", "C", "D"]]
+    ).append_column("st_refname", [["a", "b", "c", "d"]])
+    selected = eq.select_solutions(solutions, {
+        "pl_name": "planet_name", "pl_rade_reflink": "radius_ref",
+        "st_teff_reflink": "star-teff_ref",
+    })
+    assert selected["pl_rade_reflink"].to_pylist() == ["B", "D"]
+    assert selected["st_teff_reflink"].to_pylist() == ["b", "d"]
+
+    empty = eq.select_solutions(eq.empty_result(catalogue, "ps"), catalogue)
+    assert empty.num_rows == 0
+    assert empty.column_names == list(catalogue)
+
+
+def test_offline_ps_needs_full_snapshot(tmp_path, monkeypatch):
+    """Default-only snapshots of 'ps' are rejected for the ps mode"""
+    pytest.importorskip("duckdb")
+    import modules.epa_snapshot as snapshot
+    import json
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(eq, "OFFLINE", True)
+    snapshot.refresh_snapshot(lambda adql: ps_solutions(), ["ps"])
+
+    result = eq.query_nasa_epa(
+        np.array(["GJ 1214 b"]), output="arrow", table="ps",
+        columns=["planet_name", "radius_rearth"]
+    )
+    assert result["radius_rearth"].to_pylist() == [2.742]
+
+    # Snapshot made with the former default-only query
+    info_file = f"{snapshot.SNAPSHOT_DIR}/{snapshot.SNAPSHOT_INFO}"
+    with open(info_file, "r") as file:
+        info = json.load(file)
+    info["ps"]["query"] = "SELECT * FROM ps WHERE default_flag = 1"
+    with open(info_file, "w") as file:
+        json.dump(info, file)
+
+    with pytest.raises(ValueError, match="OUTDATED"):
+        eq.query_nasa_epa(np.array(["GJ 1214 b"]), table="ps")
@@ -0,0 +1,68 @@
+import pytest
+
+for dependency in [
+    "numpy", "pandas", "polars", "pyarrow", "astropy", "pyvo", "duckdb"
+]:
+    pytest.importorskip(dependency)
+
+import modules.epa_snapshot as snapshot
+import target_snapshot as ts
+import pyarrow as pa
+import pandas as pd
+import sys
+
+
+def fake_archive(adql_query: str) -> pa.Table:
+    """Archive stand-in: two planets, the second one without a radius"""
+    return pa.table({
+        "pl_name": ["GJ 1214 b", "TOI-270 c"], "pl_rade": [2.742, None],
+        "default_flag": [1, 1],
+    })
+
+
+@pytest.mark.parametrize("arguments, tables", [
+    ([], None), (["ps"], ["ps"]), (["ps", "pscomppars"], ["ps", "pscomppars"])
+])
+def test_refresh_arguments(monkeypatch, arguments, tables):
+    """Without table names, all tables are refreshed"""
+    monkeypatch.setattr(sys, "argv", ["target_snapshot.py", "refresh"]
+                        + arguments)
+    received = []
+    monkeypatch.setattr(
+        snapshot, "refresh_snapshot",
+        lambda function, names: received.append(names) or {}
+    )
+
+    ts.main()
+    assert received == [tables]
+
+
+def test_refresh_rejects_unknown_tables(tmp_path):
+    with pytest.raises(AssertionError, match="NOT RECOGNIZED"):
+        snapshot.refresh_snapshot(
+            fake_archive, ["pscomppars", "bogus"], str(tmp_path)
+        )
+
+    # Nothing is downloaded for an invalid request
+    assert snapshot.read_snapshot_info(str(tmp_path)) == {}
+
+
+def test_local_query(tmp_path):
+    """Snapshot tables, TOP and uploads in the DuckDB executor"""
+    snapshot_dir = str(tmp_path)
+    info = snapshot.refresh_snapshot(fake_archive, None, snapshot_dir)
+    assert info["pscomppars"]["rows"] == 2
+
+    result = snapshot.run_local_query(
+        "SELECT TOP 1 pl_name FROM pscomppars WHERE pl_rade IS NOT NULL",
+        snapshot_dir=snapshot_dir
+    )
+    assert result["pl_name"].to_pylist() == ["GJ 1214 b"]
+
+    result = snapshot.run_local_query(
+        "SELECT p.pl_name FROM ps AS p JOIN TAP_UPLOAD.targets AS t "
+        "ON p.pl_name = t.target_name",
+        uploads={"targets": pd.DataFrame({"target_name": ["TOI-270 c"]})},
+        snapshot_dir=snapshot_dir
+    )
+    assert result["pl_name"].to_pylist() == ["TOI-270 c"]
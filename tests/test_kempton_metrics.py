@@ -0,0 +1,107 @@
+import pytest
+
+for dependency in ["numpy", "pandas", "astropy"]:
+    pytest.importorskip(dependency)
+
+import modules.kempton_metrics as km
+import astropy.units as u
+import pandas as pd
+import numpy as np
+
+RTOL = 1e-10
+
+
+def si_values(values) -> np.ndarray:
+    """Plain float64 values of a quantity (in SI units) or a series"""
+    if isinstance(values, u.Quantity):
+        return values.si.value
+
+    return np.asarray(values, dtype=np.float64)
+
+
+@pytest.fixture
+def planets() -> pd.DataFrame:
+    """Random planets across the range of the archive"""
+    rng = np.random.default_rng(7)
+    size = 200
+
+    return pd.DataFrame({
+        "pl_rade": rng.uniform(0.5, 15., size),
+        "pl_masse": rng.uniform(0.3, 300., size),
+        "pl_orbsmax": rng.uniform(0.01, 1., size),
+        "pl_eqt": rng.uniform(200., 2500., size),
+        "st_teff": rng.uniform(2800., 7000., size),
+        "st_rad": rng.uniform(0.1, 2., size),
+        "sy_jmag": rng.uniform(5., 14., size),
+        "sy_kmag": rng.uniform(5., 14., size),
+    })
+
+
+def test_teq_and_planck(planets):
+    """Fast kernels agree with the astropy versions"""
+    np.testing.assert_allclose(
+        km.fast_teq(planets["st_teff"].to_numpy(),
+                    planets["st_rad"].to_numpy(),
+                    planets["pl_orbsmax"].to_numpy()),
+        si_values(km.kempton_teq(planets)), rtol=RTOL
+    )
+
+    temperature = planets["st_teff"].to_numpy()
+    for wavelength in [0.5e-6, km.ESM_WAVELENGTH, 20e-6]:
+        np.testing.assert_allclose(
+            km.fast_planck(temperature, wavelength),
+            si_values(km.planck_function_lambda(
+                temperature * u.K, wavelength * u.m
+            )), rtol=RTOL
+        )
+
+    # Units are converted, not dropped
+    np.testing.assert_allclose(
+        si_values(km.planck_function_lambda(
+            temperature * u.K, 7.5 * u.micron
+        )),
+        km.fast_planck(temperature, 7.5e-6), rtol=RTOL
+    )
+
+
+def test_metrics(planets):
+    """TSM and ESM of the fast and the astropy path"""
+    columns = km.epa_arrays(planets)
+
+    np.testing.assert_allclose(
+        km.fast_tsm(columns["pl_rade"], columns["pl_eqt"],
+                    columns["pl_masse"], columns["st_rad"],
+                    columns["sy_jmag"]),
+        si_values(km.kempton_tsm(planets)), rtol=RTOL
+    )
+    np.testing.assert_allclose(
+        km.fast_esm(columns["pl_eqt"], columns["st_teff"],
+                    columns["pl_rade"], columns["st_rad"],
+                    columns["sy_kmag"]),
+        si_values(km.kempton_esm(planets)), rtol=RTOL
+    )
+
+
+def test_transit_signal(planets):
+    """Surface gravity, scale height and atmospheric signal"""
+    columns = km.epa_arrays(planets)
+
+    np.testing.assert_allclose(
+        km.fast_grav_g(columns["pl_masse"], columns["pl_rade"]),
+        si_values(km.calc_grav_g(planets["pl_masse"], planets["pl_rade"])),
+        rtol=RTOL
+    )
+
+    for mmw in [2, 25]:
+        np.testing.assert_allclose(
+            km.fast_scale_height(mmw, columns["pl_eqt"],
+                                 columns["pl_masse"], columns["pl_rade"]),
+            si_values(km.calc_scale_height(mmw, planets)), rtol=RTOL
+        )
+        np.testing.assert_allclose(
+            km.fast_atmospheric_signal(
+                mmw, columns["pl_eqt"], columns["pl_masse"],
+                columns["pl_rade"], columns["st_rad"]
+            ),
+            si_values(km.atmospheric_signal(mmw, planets)), rtol=RTOL
+        )
@@ -0,0 +1,69 @@
+import pytest
+
+for dependency in ["numpy", "pandas", "astropy"]:
+    pytest.importorskip(dependency)
+
+import modules.kempton_metrics as km
+import modules.planck_table as pt
+import pandas as pd
+import numpy as np
+import importlib
+import os
+
+REPOSITORY = os.path.dirname(os.path.dirname(__file__))
+
+
+@pytest.mark.parametrize("wavelengths", [
+    (km.ESM_WAVELENGTH,), (0.6e-6, 2.95e-6, 9.5e-6, 15e-6),
+])
+def test_lookup_tolerance(wavelengths):
+    """Interpolated radiances stay within TABLE_TOLERANCE"""
+    table = pt.planck_table(wavelengths)
+    temperature = np.random.default_rng(3).uniform(
+        *pt.TABLE_TEMPERATURES, 10000
+    )
+
+    exact = km.fast_planck(temperature[:, None], np.array(wavelengths))
+    np.testing.assert_allclose(
+        pt.planck_lookup(temperature, table), exact,
+        rtol=pt.TABLE_TOLERANCE, atol=0
+    )
+
+    # Outside of the table, values are exact
+    outside = np.array([50., 1e5])
+    np.testing.assert_allclose(
+        pt.planck_lookup(outside, table),
+        km.fast_planck(outside[:, None], np.array(wavelengths)), rtol=1e-12
+    )
+
+
+def test_band_centres():
+    """Ranges, single wavelengths and non-numeric MRS entries"""
+    bands = pd.Series(["2.87 – 5.18", "15", "Short", "0.6 - 2.8", "15"])
+
+    np.testing.assert_allclose(
+        pt.band_centre(bands) * 1e6, [4.025, 15., np.nan, 1.7, 15.]
+    )
+    np.testing.assert_allclose(pt.unique_bands(bands) * 1e6, [1.7, 4.025, 15.])
+
+
+def test_band_esm(monkeypatch):
+    """Per-band ESM of create_tsm_table, at the cycle file bands"""
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("astroquery")
+    monkeypatch.chdir(REPOSITORY)
+    tsm_script = importlib.import_module("target_spectroscopy-metric")
+
+    planets = pd.DataFrame({
+        "pl_eqt": [300., 1500.], "st_teff": [3300., 6000.],
+        "pl_rade": [1., 11.], "st_rad": [0.2, 1.2], "sy_kmag": [8., 10.],
+    })
+    band_esm = tsm_script.band_esm(planets)
+
+    assert "ESM_9.5um" in band_esm.columns
+    assert "ESM_15um" in band_esm.columns
+    np.testing.assert_allclose(
+        band_esm["ESM_9.5um"],
+        km.fast_esm(*[planets[name].to_numpy() for name in planets.columns],
+                    wavelength=9.5e-6), atol=1
+    )
@@ -0,0 +1,70 @@
+import pytest
+
+for dependency in ["polars"]:
+    pytest.importorskip(dependency)
+
+import modules.query_versions as qv
+import polars as pl
+
+
+def version_frames() -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Two query results: one change, one added and one removed value"""
+    old_frame = pl.DataFrame({
+        "planet_name": ["GJ 1214 b", "TOI-270 c", "WASP-39 b"],
+        "radius_rearth": [2.742, 2.355, 14.3],
+        "mass_mearth": [8.17, None, 89.0],
+        "host_name": ["GJ 1214", "TOI-270", "WASP-39"],
+    })
+    new_frame = pl.DataFrame({
+        "planet_name": ["GJ 1214 b", "TOI-270 c", "55 Cnc e"],
+        "radius_rearth": [2.733, 2.355, 1.875],
+        "mass_mearth": [8.17, 6.15, 7.99],
+        "host_name": ["GJ 1214", "TOI-270", "55 Cnc"],
+    })
+
+    return old_frame, new_frame
+
+
+def test_diff_versions():
+    diff = qv.diff_versions(*version_frames())
+    changes = {
+        (row["planet_name"], row["parameter"]): row["change"]
+        for row in diff.iter_rows(named=True)
+    }
+
+    assert changes == {
+        ("55 Cnc e", "host_name"): "added",
+        ("55 Cnc e", "mass_mearth"): "added",
+        ("55 Cnc e", "radius_rearth"): "added",
+        ("GJ 1214 b", "radius_rearth"): "changed",
+        ("TOI-270 c", "mass_mearth"): "added",
+        ("WASP-39 b", "host_name"): "removed",
+        ("WASP-39 b", "mass_mearth"): "removed",
+        ("WASP-39 b", "radius_rearth"): "removed",
+    }
+
+
+def test_identical_versions_have_no_diff(tmp_path):
+    """Stored and reloaded unchanged results give an empty diff"""
+    old_frame, _ = version_frames()
+    for version in ["20260101T000000Z", "20260201T000000Z"]:
+        qv.store_version(old_frame, "cycle-1", version, str(tmp_path))
+
+    versions = qv.list_versions(str(tmp_path))
+    diff = qv.diff_versions(*[
+        qv.load_version(version, version_dir=str(tmp_path))
+        for version in versions
+    ])
+
+    assert diff.height == 0
+    assert qv.planets_to_replot(diff).height == 0
+
+
+def test_planets_to_replot():
+    diff = qv.diff_versions(*version_frames())
+    replot = qv.planets_to_replot(diff, ["radius_rearth"])
+
+    assert replot["planet_name"].to_list() == [
+        "55 Cnc e", "GJ 1214 b", "WASP-39 b"
+    ]
+    assert replot["n_changes"].to_list() == [1, 1, 1]
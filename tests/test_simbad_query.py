@@ -0,0 +1,117 @@
+import pytest
+
+for dependency in ["numpy", "pandas", "astropy", "astroquery"]:
+    pytest.importorskip(dependency)
+
+import modules.simbad_query as sq
+from astropy.table import Table
+
+
+class FakeSimbad:
+    """Stand-in for astroquery's Simbad, recording the queried names"""
+    def __init__(self, known: dict, upper_case: bool = False):
+        self.known = known
+        self.upper_case = upper_case
+        self.queried = []
+        self.outage = False
+
+    def query_objects(self, names: list):
+        self.queried += list(names)
+        if self.outage:
+            return None
+
+        rows = [(name, self.known[name]) for name in names
+                if name in self.known]
+        if self.upper_case:
+            # Layout before astroquery 0.4.8
+            return Table(
+                rows=[(main_id, names.index(name) + 1)
+                      for name, main_id in rows],
+                names=["MAIN_ID", "SCRIPT_NUMBER_ID"]
+            )
+
+        return Table(rows=rows, names=["user_specified_id", "main_id"])
+
+
+@pytest.fixture
+def simbad(monkeypatch):
+    fake = FakeSimbad({"TOI-270 c": "TOI-270 c", "Kepler-10 b": "K-10 b"})
+    monkeypatch.setattr(sq, "Simbad", fake)
+
+    return fake
+
+
+@pytest.mark.parametrize("upper_case", [False, True])
+def test_column_layouts(simbad, tmp_path, upper_case):
+    """Old (upper case) and new (lower case) result columns"""
+    simbad.upper_case = upper_case
+    aliases = sq.resolve_simbad_ids(
+        ["Kepler-10 b", "TrES-2 b"], cache_file=str(tmp_path / "a.json")
+    )
+
+    assert aliases == {"Kepler-10 b": "K-10 b", "TrES-2 b": "TrES-2 b"}
+
+
+def test_outage_is_not_cached(simbad, tmp_path):
+    """Names of a failed batch are queried again in the next run"""
+    cache_file = str(tmp_path / "aliases.json")
+
+    simbad.outage = True
+    aliases = sq.resolve_simbad_ids(["Kepler-10 b"], cache_file=cache_file)
+    assert aliases == {"Kepler-10 b": "Kepler-10 b"}
+
+    simbad.outage = False
+    aliases = sq.resolve_simbad_ids(["Kepler-10 b"], cache_file=cache_file)
+    assert aliases == {"Kepler-10 b": "K-10 b"}
+    assert simbad.queried == ["Kepler-10 b", "Kepler-10 b"]
+
+
+def test_cache_and_expiry(simbad, tmp_path):
+    """Resolved names stay cached, unknown names expire, refresh"""
+    cache_file = str(tmp_path / "aliases.json")
+    names = ["Kepler-10 b", "TrES-2 b"]
+
+    sq.resolve_simbad_ids(names, cache_file=cache_file)
+    sq.resolve_simbad_ids(names, cache_file=cache_file)
+    assert simbad.queried == names
+
+    # Expired unknown names are retried, resolved ones are not
+    sq.resolve_simbad_ids(names, cache_file=cache_file, ttl=-1)
+    assert simbad.queried == names + ["TrES-2 b"]
+
+    sq.resolve_simbad_ids(names, refresh=True, cache_file=cache_file)
+    assert simbad.queried == names + ["TrES-2 b"] + names
+
+
+def test_old_cache_layout_is_discarded(simbad, tmp_path):
+    """Flat caches (which stored failed lookups) are rebuilt"""
+    cache_file = tmp_path / "aliases.json"
+    cache_file.write_text('{"Kepler-10 b": "Kepler-10 b"}')
+
+    aliases = sq.resolve_simbad_ids(
+        ["Kepler-10 b"], cache_file=str(cache_file)
+    )
+    assert aliases == {"Kepler-10 b": "K-10 b"}
+
+
+def test_match_to_archive(simbad, tmp_path, monkeypatch):
+    """Separator variants, sibling letters and the SIMBAD fallback"""
+    monkeypatch.chdir(tmp_path)     # Alias cache of this test only
+    simbad.known.update({
+        "KOI-72 b": "K-10 b", "TOI-270 d": "TOI-270 d",
+    })
+
+    archive = ["TOI-270 c", "TOI-270 d", "Kepler-10 b", "WASP-39 b"]
+    name_index = sq.ni.build_name_index(archive)
+    name_list = ["TOI 270 c", "TOI-270d", "KOI-72 b", "TOI-270 e"]
+
+    # Sibling letters never match each other
+    assert sq.match_to_archive(name_index, name_list, False) == {
+        "TOI-270 c", "TOI-270 d"
+    }
+
+    # Names only sharing their SIMBAD identifier
+    assert sq.match_to_archive(name_index, name_list) == {
+        "TOI-270 c", "TOI-270 d", "Kepler-10 b"
+    }
+    assert "TOI-270 e" in simbad.queried
@@ -0,0 +1,101 @@
+import pytest
+
+for dependency in [
+    "numpy", "pandas", "polars", "pyarrow", "astropy", "pyvo", "matplotlib"
+]:
+    pytest.importorskip(dependency)
+
+from pandas.testing import assert_frame_equal
+import target_parameters as tp
+import pandas as pd
+import numpy as np
+import copy as cp
+
+
+def construct_new_df_loop(
+        csv_df: pd.DataFrame, epa_df: pd.DataFrame
+        ) -> pd.DataFrame:
+    """
+    construct_new_df before the merge (reference implementation). The
+    NaN columns start as object columns, since pandas 3 refuses to
+    upcast float columns by cell assignment; the final cast restores
+    the former dtypes (numbers as floats).
+    """
+    new_df = cp.deepcopy(csv_df[[
+        "Target Name", "Instrument", "Type", "ObsCycle", "EAP [mon]"
+    ]])
+    epa_cols = epa_df.columns
+    for column in epa_cols:
+        new_df[column] = pd.Series(np.nan, index=new_df.index, dtype=object)
+
+    for idx in range(epa_df.shape[0]):
+        epa_subframe = epa_df.iloc[idx]
+
+        csv_idxs = new_df.loc[
+            new_df["Target Name"] == epa_subframe["pl_name"]
+        ].index.to_list()
+
+        for match_idx in csv_idxs:
+            for column in epa_cols:
+                new_df.at[match_idx, column] = epa_subframe.loc[column]
+
+    new_df = new_df.infer_objects()
+    return new_df.astype({
+        column: np.float64 for column in epa_cols
+        if pd.api.types.is_numeric_dtype(new_df[column])
+    })
+
+
+def observation_frames(all_found: bool) -> tuple:
+    """Observation list (with an extra column) and EPA query result"""
+    csv_df = pd.DataFrame({
+        "Target Name": ["GJ 1214 b", "WASP-39 b", "Unknown b", "GJ 1214 b"],
+        "Instrument": ["MIRI", "NIRSpec", "NIRISS", "NIRCam"],
+        "Type": ["Transit", "Transit", "Eclipse", "Transit"],
+        "ObsCycle": ["Cycle 1", "Cycle 1", "Cycle 2", "Cycle 2"],
+        "EAP [mon]": [12, 0, 12, 0],
+        "Comment": ["", "ERS", "", ""],
+    }, index=[3, 5, 7, 9])
+
+    if all_found:
+        csv_df = csv_df.drop(index=7)
+
+    epa_df = pd.DataFrame({
+        "pl_name": ["WASP-39 b", "GJ 1214 b"],
+        "hostname": ["WASP-39", "GJ 1214"],
+        "sy_pnum": [1, 1],
+        "pl_rade": [14.3, 2.742],
+        "pl_orbper": [4.055, 1.580],
+    })
+
+    return csv_df, epa_df
+
+
+@pytest.mark.parametrize("all_found", [True, False])
+def test_construct_new_df_matches_loop(all_found):
+    """Merge gives the frame of the loop (values, dtypes, labels)"""
+    csv_df, epa_df = observation_frames(all_found)
+
+    assert_frame_equal(
+        tp.construct_new_df(csv_df, epa_df),
+        construct_new_df_loop(csv_df, epa_df)
+    )
+
+
+@pytest.mark.parametrize("all_found", [True, False])
+def test_construct_new_df_layout(all_found):
+    """Column order, row labels, float EPA numbers, unmatched rows"""
+    csv_df, epa_df = observation_frames(all_found)
+    new_df = tp.construct_new_df(csv_df, epa_df)
+
+    assert list(new_df.columns) == [
+        "Target Name", "Instrument", "Type", "ObsCycle", "EAP [mon]",
+        "pl_name", "hostname", "sy_pnum", "pl_rade", "pl_orbper",
+    ]
+    assert list(new_df.index) == list(csv_df.index)
+    assert new_df["sy_pnum"].dtype == np.float64
+    assert new_df["EAP [mon]"].dtype == csv_df["EAP [mon]"].dtype
+
+    assert list(new_df.loc[9, ["hostname", "pl_rade"]]) == ["GJ 1214", 2.742]
+    if not all_found:
+        assert new_df.loc[7, ["pl_name", "sy_pnum"]].isna().all()
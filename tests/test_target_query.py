@@ -0,0 +1,82 @@
+import pytest
+
+for dependency in [
+    "numpy", "polars", "pandas", "pyarrow", "astropy", "pyvo", "matplotlib"
+]:
+    pytest.importorskip(dependency)
+
+from benchmarks.update_frame_reference import (
+    update_frame_rowwise, synthetic_cycle
+)
+from polars.testing import assert_frame_equal
+import target_query as tq
+import polars as pl
+import numpy as np
+
+
+@pytest.mark.parametrize("n_failed", [0, 3])
+def test_update_frame_matches_rowwise(n_failed):
+    """Join and row-wise update give the same frame (incl. failures)"""
+    cycle_frame, query_result = synthetic_cycle(200, 20, n_failed)
+
+    joined = tq.update_frame(cycle_frame, query_result)
+    rowwise = update_frame_rowwise(cycle_frame, query_result)
+
+    assert_frame_equal(joined, rowwise)
+
+    if n_failed > 0:
+        failed = joined.filter(pl.col("planet_name") == "Planet-19 b")
+        assert failed["host_name"].to_list() == ["NaN"] * failed.height
+        assert np.isnan(failed["radius_rearth"].to_numpy()).all()
+
+
+def test_versions_store_raw_query_results(monkeypatch):
+    """Monte Carlo HZ columns are not part of the stored version"""
+    stored = {}
+    monkeypatch.setattr(
+        tq.qv, "store_version",
+        lambda frame, name, version: stored.update({name: frame})
+    )
+    monkeypatch.setattr(tq, "save_parameters", lambda *args: None)
+
+    cycle_frame = pl.DataFrame({"planet_name": ["GJ 1214 b"]})
+    query_result = pl.DataFrame({
+        "planet_name": ["GJ 1214 b"], "sma_au": [0.0149],
+        "star-teff_kelvin": [3250.], "star-teff_errpos": [100.],
+        "star-teff_errneg": [-100.], "star-log10-lbol_lsol": [-2.4],
+        "star-log10-lbol_errpos": [0.05], "star-log10-lbol_errneg": [-0.05],
+    })
+
+    combined = tq.finalise_cycle(cycle_frame, 1, query_result, "v1")
+
+    assert "hz_conservative_prob" in combined.columns
+    assert stored["cycle-1"].equals(query_result)
+
+
+def test_handle_all_files_returns_cycle_order(monkeypatch):
+    """Cycle frames come back in cycle order, not completion order"""
+    import asyncio
+    import time
+
+    def read_cycle(filename):
+        cycle_n = int(filename[-5])
+        return pl.DataFrame({"planet_name": [f"c{cycle_n}"]}), cycle_n
+
+    def slow_query(query_names):
+        # Earlier cycles take longer
+        time.sleep(0.05 * (4 - int(query_names[0][1])))
+        return pl.DataFrame({"planet_name": query_names})
+
+    monkeypatch.setattr(tq, "read_jwst_cycle", read_cycle)
+    monkeypatch.setattr(tq, "query_planet_names", slow_query)
+    monkeypatch.setattr(
+        tq, "finalise_cycle", lambda frame, cycle_n, result, version: frame
+    )
+
+    frames = asyncio.run(tq.handle_all_files(
+        ["jwst_cycle_1.csv", "jwst_cycle_2.csv", "jwst_cycle_3.csv"]
+    ))
+
+    assert [frame["planet_name"][0] for frame in frames] == [
+        "c1", "c2", "c3"
+    ]
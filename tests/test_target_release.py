@@ -0,0 +1,64 @@
+import pytest
+
+for dependency in ["numpy", "pandas", "pyarrow", "matplotlib", "astropy"]:
+    pytest.importorskip(dependency)
+
+import target_schedule as ts
+import target_release as tr
+import shutil
+import os
+
+REPOSITORY = os.path.dirname(os.path.dirname(__file__))
+
+
+@pytest.fixture
+def cycle_files(tmp_path, monkeypatch):
+    """Copies of the cycle files (cycle 2 without dates), own partials"""
+    partials = tmp_path / "partials"
+    partials.mkdir()
+    monkeypatch.setattr(tr, "PARTIALS", str(partials))
+    monkeypatch.setattr(tr, "MANIFEST", str(partials / "manifest.json"))
+
+    copies = {}
+    for cycle, file_name in ts.CYCLE_FILES.items():
+        copies[cycle] = str(tmp_path / os.path.basename(file_name))
+        shutil.copy(os.path.join(REPOSITORY, file_name), copies[cycle])
+
+    return copies
+
+
+def test_update_partials(cycle_files):
+    """Cycle files without observation dates give empty partials"""
+    partial_tables = tr.update_partials(cycle_files)
+
+    assert partial_tables[0].shape[0] > 0
+    assert partial_tables[1].empty
+
+    report = tr.combine_partials(partial_tables)
+    assert report["n_obs"].sum() == partial_tables[0]["n_obs"].sum()
+    assert set(report["cycles"]) == {"1"}
+
+
+def test_unchanged_hash_reuses_partial(cycle_files, monkeypatch):
+    """Only cycle files with a new content hash are processed again"""
+    first_run = tr.update_partials(cycle_files)
+
+    computed = []
+    release_partial = tr.release_partial
+
+    def counting_partial(file_name, cycle):
+        computed.append(cycle)
+        return release_partial(file_name, cycle)
+
+    monkeypatch.setattr(tr, "release_partial", counting_partial)
+
+    second_run = tr.update_partials(cycle_files)
+    assert computed == []
+    for first, second in zip(first_run, second_run):
+        assert first.equals(second)
+
+    # A changed file is recomputed, the other partial is reused
+    with open(cycle_files[2], "a") as file:
+        file.write("\n")
+    tr.update_partials(cycle_files)
+    assert computed == [2]
@@ -0,0 +1,48 @@
+import pytest
+
+for dependency in ["numpy", "pandas", "matplotlib"]:
+    pytest.importorskip(dependency)
+
+import target_schedule as ts
+import pandas as pd
+import numpy as np
+import os
+
+REPOSITORY = os.path.dirname(os.path.dirname(__file__))
+
+
+def test_read_all_cycles(monkeypatch):
+    """Cycle files with and without observation dates"""
+    monkeypatch.chdir(REPOSITORY)
+    raw_frames = {
+        cycle: pd.read_csv(file_name)
+        for cycle, file_name in ts.CYCLE_FILES.items()
+    }
+    cycles = ts.read_all_cycles()
+
+    # Cycle 2 has no dates yet, and is read as a float column
+    assert raw_frames[2][ts.DATE_COLUMN].isna().all()
+    assert set(cycles["ObsCycle"]) == {1}
+
+    dated = raw_frames[1][ts.DATE_COLUMN].dropna()
+    n_dates = dated.str.split(";").str.len().sum()
+    n_long_range = dated.str.contains("Long Range").sum()
+    assert cycles.shape[0] == n_dates - n_long_range
+
+    # Release dates are the observation dates shifted by the EAP
+    months = (cycles[ts.DATE_COLUMN].dt.year * 12
+              + cycles[ts.DATE_COLUMN].dt.month) \
+        - (cycles["Observed Date"].dt.year * 12
+           + cycles["Observed Date"].dt.month)
+    np.testing.assert_array_equal(months, cycles["EAP [mon]"])
+
+
+def test_explode_without_dates():
+    """A column without any date leaves an empty frame"""
+    raw_frame = pd.DataFrame({
+        "Target Name": ["TOI-270 d"], "Proposal ID": [4098],
+        "EAP [mon]": [12], ts.DATE_COLUMN: [np.nan],
+    })
+
+    exploded = ts.explode_df_obs_date(raw_frame, ts.DATE_COLUMN, ";")
+    assert exploded.empty